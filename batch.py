@@ -0,0 +1,190 @@
+"""Batch CLI: proses banyak file Data Bulanan sekaligus tanpa Streamlit.
+
+Contoh (backfill setahun):
+    python batch.py --input-dir bulanan/ --database Database.xlsx \
+        --mapping Mapping.xlsx --output Data_Hasil.xlsx
+
+Periode tiap file diambil dari namanya: Tahun lalu bulan, mis.
+"2025-03.xlsx" atau "Data_2025_03.xlsx". Unpivot berjalan paralel di
+process pool; MS & growth dihitung sekali atas gabungan semua bulan.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (
+    lazy_module, unpivot_produsen_holding_merk, unpivot_sheets, prepare_current, compile_mapping, apply_mapping,
+    align_with_history, compact_schema, calc_ms_and_growth, finalize_result,
+    history_load, history_write, build_rollup_cube, cube_write, EXPORT_FORMATS, export_result,
+    read_database_xlsx, read_result, result_digest, result_delta, digest_write, digest_load,
+)
+
+pd = lazy_module("pandas")   # --help & parsing argumen tanpa memuat pandas
+
+RE_PERIODE = re.compile(r"(?<!\d)(\d{4})[-_. ]?(0[1-9]|1[0-2])(?!\d)")
+
+def parse_periode(path: str) -> tuple:
+    """(Tahun, nbulan) dari nama file."""
+    m = RE_PERIODE.search(os.path.basename(path))
+    if not m:
+        raise ValueError(f"Periode (Tahun & bulan) tidak ditemukan di nama file: {path}")
+    return int(m.group(1)), int(m.group(2))
+
+def list_monthly_files(input_dir: str) -> list:
+    """[(path, tahun, nbulan)] untuk semua .xlsx di folder, urut periode."""
+    files = []
+    for name in sorted(os.listdir(input_dir)):
+        if name.lower().endswith(".xlsx") and not name.startswith("~$"):
+            path = os.path.join(input_dir, name)
+            files.append((path, *parse_periode(path)))
+    seen = {}
+    for path, tahun, nbulan in files:
+        if (tahun, nbulan) in seen:
+            raise ValueError(f"Periode {tahun}-{nbulan:02d} ganda: {seen[(tahun, nbulan)]} & {path}")
+        seen[(tahun, nbulan)] = path
+    return sorted(files, key=lambda f: (f[1], f[2]))
+
+def unpivot_file(path: str, tahun: int, nbulan: int, sheet_name=0) -> pd.DataFrame:
+    """Worker: unpivot satu file bulanan + kolom periode (tanpa mapping).
+
+    `sheet_name` berupa list = beberapa sheet digabung (berurutan di worker ini).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if isinstance(sheet_name, list):
+        df_long = unpivot_sheets(data, sheet_name, workers=1)
+    else:
+        df_long = unpivot_produsen_holding_merk(data, sheet_name=sheet_name)
+    return prepare_current(df_long, tahun, nbulan)
+
+def run_batch(files: list, db: pd.DataFrame, mapping_df: pd.DataFrame,
+              sheet_name=0, workers: int = None, float32: bool = False,
+              remap_history: bool = False, cube: bool = False):
+    """Unpivot paralel semua file lalu hitung sekali.
+
+    Return (final, db_clean, current_aligned, cube); db_clean = Database tanpa
+    periode yang diganti file bulanan.
+
+    `remap_history=True`: Segment & Area AP di Database diisi ulang dari Mapping.
+    `cube=True`: rollup cube ikut dibangun (selain itu None).
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(unpivot_file, path, tahun, nbulan, sheet_name)
+                   for path, tahun, nbulan in files]
+        parts = [fut.result() for fut in futures]
+
+    mapping_index = compile_mapping(mapping_df)
+    current_core = apply_mapping(pd.concat(parts, ignore_index=True), mapping_index)
+    if remap_history:
+        db = apply_mapping(db, mapping_index)
+    db_clean, current_aligned, keep_cols = align_with_history(db, current_core)
+    calc_input = [db_clean, current_aligned]
+    # Cube dari data presisi penuh (ikut disimpan ke history store)
+    rollup = build_rollup_cube(pd.concat(calc_input, ignore_index=True)) if cube else None
+    if float32:
+        calc_input = compact_schema(calc_input, float32=True)
+    result = calc_ms_and_growth(pd.concat(calc_input, ignore_index=True))
+    return finalize_result(result, keep_cols), db_clean, current_aligned, rollup
+
+def load_previous(path: str):
+    """Snapshot hasil sebelumnya: file Data_Hasil (xlsx/csv/parquet) atau history store SQLite."""
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    if ext in EXPORT_FORMATS:
+        with open(path, "rb") as f:
+            return result_digest(read_result(f.read(), ext))
+    return digest_load(path)
+
+def _sheet_arg(value: str):
+    if "," in value:
+        return [_sheet_arg(v.strip()) for v in value.split(",") if v.strip()]
+    return int(value) if value.isdigit() else value
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Automasi Market Share & Mapping (batch).")
+    parser.add_argument("--input-dir", required=True, help="Folder file Data Bulanan (.xlsx), periode di nama file.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--database", help="Database (.xlsx).")
+    src.add_argument("--history-store", help="History store SQLite sebagai Database.")
+    parser.add_argument("--mapping", required=True, help="Mapping (.xlsx).")
+    parser.add_argument("--output", default="Data_Hasil.xlsx", help="File hasil (default: Data_Hasil.xlsx).")
+    parser.add_argument("--sheet", type=_sheet_arg, default=0, help="Nama / index sheet Data Bulanan (default: 0); "
+                             "pisahkan dengan koma untuk menggabungkan beberapa sheet.")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses (default: semua core).")
+    parser.add_argument("--save-history", metavar="PATH",
+                        help="Tulis periode hasil batch ke history store SQLite (overwrite per periode); "
+                             "isi --database (atau store lain) ikut diimpor.")
+    parser.add_argument("--remap-history", action="store_true",
+                        help="Isi ulang Segment & Area AP di Database dari --mapping "
+                             "(untuk hitung; ke store sumber yang sama --save-history tetap hanya menulis periode baru).")
+    parser.add_argument("--cube", metavar="PATH",
+                        help="Tulis juga rollup cube (format dari ekstensi; ikut --save-history bila ada).")
+    parser.add_argument("--float32", action="store_true",
+                        help="Hitung metrik dalam float32 (hemat memori, presisi ~7 digit).")
+    parser.add_argument("--delta-from", metavar="PATH",
+                        help="Tulis hanya baris baru / berubah dibanding Data_Hasil sebelumnya "
+                             "(xlsx/csv/parquet) atau snapshot di history store SQLite.")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default=None,
+                        help="Format hasil (default: dari ekstensi --output, selain itu xlsx).")
+    args = parser.parse_args(argv)
+    ext = os.path.splitext(args.output)[1].lstrip(".").lower()
+    fmt = args.format or (ext if ext in EXPORT_FORMATS else "xlsx")
+
+    try:
+        files = list_monthly_files(args.input_dir)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not files:
+        parser.error(f"Tidak ada file .xlsx di {args.input_dir}")
+    print(f"{len(files)} file: " + ", ".join(f"{t}-{b:02d}" for _, t, b in files), file=sys.stderr)
+
+    if args.history_store:
+        db = history_load(args.history_store)
+    else:
+        with open(args.database, "rb") as f:
+            db = read_database_xlsx(f.read())
+    mapping_df = pd.read_excel(args.mapping, engine="openpyxl")
+
+    final, db_clean, current_aligned, cube = run_batch(files, db, mapping_df, sheet_name=args.sheet,
+                                                       workers=args.workers, float32=args.float32,
+                                                       remap_history=args.remap_history, cube=bool(args.cube))
+    # Delta dihitung sebelum snapshot di --save-history diperbarui
+    export_frame = final
+    if args.delta_from:
+        previous = load_previous(args.delta_from)
+        if previous is None:
+            print(f"Delta: tidak ada snapshot di {args.delta_from} → semua baris ditulis", file=sys.stderr)
+        else:
+            export_frame, counts = result_delta(final, previous)
+            print(f"Delta • baru: {counts['baru']:,} • berubah: {counts['berubah']:,} "
+                  f"• sama (dilewati): {counts['sama']:,}", file=sys.stderr)
+
+    if args.save_history:
+        # Store yang sama dengan sumber: cukup periode baru; selain itu (--database
+        # atau store lain) seluruh Database ikut diimpor agar YoY / YtD tetap ada
+        if args.history_store and os.path.abspath(args.history_store) == os.path.abspath(args.save_history):
+            to_save = current_aligned
+        else:
+            to_save = pd.concat([db_clean, current_aligned], ignore_index=True)
+        n_saved = history_write(to_save, args.save_history)
+        if not args.float32:   # snapshot float32 tidak cocok dengan run presisi penuh
+            digest_write(result_digest(final), args.save_history)
+        print(f"History store diperbarui • {n_saved:,} baris", file=sys.stderr)
+    if cube is not None:
+        cube_ext = os.path.splitext(args.cube)[1].lstrip(".").lower()
+        with open(args.cube, "wb") as f:
+            f.write(export_result(cube, cube_ext if cube_ext in EXPORT_FORMATS else "xlsx"))
+        if args.save_history:
+            cube_write(cube, args.save_history)
+        print(f"Rollup cube: {len(cube):,} baris → {args.cube}", file=sys.stderr)
+
+    with open(args.output, "wb") as f:
+        f.write(export_result(export_frame, fmt))
+    print(f"Selesai! Baris hasil: {len(export_frame):,} → {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Benchmark tiap tahap pipeline pada beberapa skala data sintetis.
+
+Mengukur waktu (wall clock) dan puncak memori (tracemalloc) per tahap,
+lalu menulis hasil sebagai JSON agar bisa dibandingkan antar versi.
+
+Contoh:
+    python benchmarks/bench.py --scales small medium --output bench_results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import engine  # noqa: E402
+from synthetic import make_universe, monthly_workbook, database_frame, mapping_frame  # noqa: E402
+
+SCALES = {
+    "small":  dict(provinces=10, producers=5,  brands=2, years=2),
+    "medium": dict(provinces=34, producers=15, brands=3, years=3),
+    "large":  dict(provinces=34, producers=30, brands=4, years=5),
+}
+END = (2025, 12)
+NEW_PERIOD = (2026, 1)
+
+def measure(fn, memory: bool = True, repeat: int = 1):
+    """Jalankan fn `repeat` kali; return (hasil, detik terbaik, puncak MB atau None)."""
+    best, peak, result = None, None, None
+    for _ in range(repeat):
+        if memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        result = fn()
+        dt = time.perf_counter() - t0
+        if memory:
+            peak = max(peak or 0.0, tracemalloc.get_traced_memory()[1] / 1e6)
+            tracemalloc.stop()
+        best = dt if best is None else min(best, dt)
+    return result, best, peak
+
+def _rows(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, tuple):
+        return _rows(obj[0])
+    return None
+
+def run_scale(name: str, params: dict, memory: bool, repeat: int, exports: list) -> list:
+    universe = make_universe(params["producers"], params["brands"], provinces=params["provinces"])
+    db_bytes = engine.write_xlsx_streaming(database_frame(universe, years=params["years"], end=END), "Sheet1")
+    cur_bytes = monthly_workbook(universe, seed=1)
+    mapping_df = mapping_frame(universe)
+
+    results = []
+    def stage(label, fn):
+        out, seconds, peak = measure(fn, memory=memory, repeat=repeat)
+        results.append({"scale": name, "stage": label, "seconds": round(seconds, 6),
+                        "peak_mb": None if peak is None else round(peak, 3), "rows": _rows(out)})
+        print(f"{name:>8} {label:<22} {seconds:9.3f}s"
+              + ("" if peak is None else f" {peak:9.1f} MB") + f"  rows={_rows(out)}", file=sys.stderr)
+        return out
+
+    stage("read_database_pandas", lambda: pd.read_excel(io.BytesIO(db_bytes), engine="openpyxl"))
+    db = stage("read_database", lambda: engine.read_database_xlsx(db_bytes))
+    stage("read_database_window", lambda: engine.read_database_xlsx(
+        db_bytes, since=engine.incremental_window_start(*END), exclude=END))
+    df_long = stage("unpivot", lambda: engine.unpivot_produsen_holding_merk(cur_bytes))
+    stage("to_numeric_text", lambda: engine.to_numeric_series(db["Total"].map("{:.3f}".format)))
+    current_core = stage("prepare_mapping", lambda: engine.apply_mapping(
+        engine.prepare_current(df_long, *NEW_PERIOD), mapping_df))
+    db_clean, current_aligned, keep_cols = stage("align_history", lambda: engine.align_with_history(db, current_core))
+    combined = pd.concat([db_clean, current_aligned], ignore_index=True)
+    result = stage("calc_ms_and_growth", lambda: engine.calc_ms_and_growth(combined))
+    stage("calc_incremental", lambda: engine.calc_ms_and_growth_incremental(db_clean, current_aligned))
+    final = stage("finalize", lambda: engine.finalize_result(result, keep_cols))
+    for fmt in exports:
+        stage(f"export_{fmt}", lambda: engine.export_result(final, fmt))
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline Market Share.")
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=1, help="Ulangi tiap tahap, ambil waktu terbaik.")
+    parser.add_argument("--no-memory", action="store_true", help="Tanpa tracemalloc (waktu lebih akurat).")
+    parser.add_argument("--exports", nargs="*", default=list(engine.EXPORT_FORMATS),
+                        choices=list(engine.EXPORT_FORMATS))
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.scales:
+        results += run_scale(name, SCALES[name], memory=not args.no_memory,
+                             repeat=args.repeat, exports=args.exports)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "memory": not args.no_memory,
+            "scales": {name: SCALES[name] for name in args.scales},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil → {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Generator data sintetis untuk benchmark: Data Bulanan, Database, Mapping.
+
+Data Bulanan mengikuti layout yang dibaca unpivot_produsen_holding_merk:
+row 6 Produsen, row 7 Kemasan (Bag / Curah), row 8.. data per provinsi,
+baris TOTAL + CATATAN sebagai footer, row 52 Merk dan row 53 Holding.
+
+Contoh:
+    python benchmarks/synthetic.py --out-dir synth/ --provinces 34 \
+        --producers 20 --brands 3 --years 3
+"""
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import (  # noqa: E402
+    BASE_COLS, DAERAH_ORDER, bulan_map, daerah_to_pulau, write_xlsx_streaming,
+    ROW_PRODUSEN, ROW_KEMASAN, ROW_MERK, ROW_HOLDING, ROW_DATA_START,
+)
+
+KEMASAN = ("Bag", "Curah")
+# Data + TOTAL + baris kosong + CATATAN harus selesai sebelum row 52 (Merk)
+MAX_PROVINCES = ROW_MERK - ROW_DATA_START - 3
+
+def make_universe(producers: int = 10, brands: int = 3, holdings: int = 4,
+                  provinces: int = 34) -> dict:
+    """Daftar provinsi & kolom (Produsen, Holding, Merk) yang dipakai semua file."""
+    if not 1 <= provinces <= MAX_PROVINCES:
+        raise ValueError(f"provinces harus 1..{MAX_PROVINCES} (layout row 8 s/d row 52)")
+    daerah = list(DAERAH_ORDER[:provinces])
+    daerah += [f"Provinsi {i}" for i in range(len(daerah) + 1, provinces + 1)]
+    brands_df = pd.DataFrame(
+        [{"Produsen": f"PT Produsen {p:02d}", "Holding": f"Holding {p % holdings + 1}",
+          "Merk": f"Merk {p:02d}-{b}"}
+         for p in range(1, producers + 1) for b in range(1, brands + 1)]
+    )
+    return {"daerah": daerah, "brands": brands_df}
+
+def _volumes(universe: dict, seed: int, n_periods: int = 1) -> np.ndarray:
+    """Volume [periode x provinsi x merk x kemasan]: skala dasar x noise bulanan."""
+    rng = np.random.default_rng(seed)
+    shape = (len(universe["daerah"]), len(universe["brands"]), len(KEMASAN))
+    base = np.random.default_rng(0).lognormal(mean=6.0, sigma=1.2, size=shape)
+    noise = rng.lognormal(mean=0.0, sigma=0.15, size=(n_periods,) + shape)
+    return np.round(base * noise, 3)
+
+def monthly_workbook(universe: dict, seed: int = 0, sheets=("Data",),
+                     dash_frac: float = 0.05, text_frac: float = 0.0) -> bytes:
+    """Satu file Data Bulanan (xlsx); tiap sheet punya layout yang sama.
+
+    `dash_frac` sel bernilai "-" (nol), `text_frac` sel angka sebagai teks
+    format Eropa ("1.234,56").
+    """
+    daerah, brands = universe["daerah"], universe["brands"]
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for s, sheet in enumerate(sheets):
+        rng = np.random.default_rng([seed, s])
+        vol = _volumes(universe, seed=rng.integers(1 << 31))[0]
+        ws = wb.create_sheet(sheet)
+        ws.cell(ROW_PRODUSEN + 1, 1, "No")
+        ws.cell(ROW_PRODUSEN + 1, 2, "Provinsi")
+        col = 3
+        for k, kemasan in enumerate(KEMASAN):
+            for j, b in enumerate(brands.itertuples(index=False)):
+                ws.cell(ROW_PRODUSEN + 1, col, b.Produsen)
+                ws.cell(ROW_KEMASAN + 1, col, kemasan)
+                ws.cell(ROW_MERK + 1, col, b.Merk)
+                ws.cell(ROW_HOLDING + 1, col, b.Holding)
+                for i in range(len(daerah)):
+                    v = float(vol[i, j, k])
+                    u = rng.random()
+                    # row 8 tidak boleh kosong / "-" (penanda kolom stop)
+                    if i > 0 and u < dash_frac:
+                        v = "-"
+                    elif u < dash_frac + text_frac:
+                        v = f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+                    ws.cell(ROW_DATA_START + 1 + i, col, v)
+                col += 1
+        for i, d in enumerate(daerah):
+            ws.cell(ROW_DATA_START + 1 + i, 1, i + 1)
+            ws.cell(ROW_DATA_START + 1 + i, 2, d)
+        r = ROW_DATA_START + 1 + len(daerah)
+        ws.cell(r, 2, "TOTAL")
+        ws.cell(r + 2, 2, "CATATAN: data sintetis untuk benchmark")
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def database_frame(universe: dict, years: int = 3, end: tuple = (2025, 12),
+                   gap_frac: float = 0.02, seed: int = 0) -> pd.DataFrame:
+    """History bulanan (kolom Database) sebanyak `years` tahun s/d `end` (Tahun, nbulan)."""
+    daerah, brands = universe["daerah"], universe["brands"]
+    last = end[0] * 12 + end[1] - 1
+    periods = np.arange(last - years * 12 + 1, last + 1)
+    vol = _volumes(universe, seed=seed, n_periods=len(periods))
+
+    p, d, b, k = np.meshgrid(np.arange(len(periods)), np.arange(len(daerah)),
+                             np.arange(len(brands)), np.arange(len(KEMASAN)), indexing="ij")
+    p, d, b, k = p.ravel(), d.ravel(), b.ravel(), k.ravel()
+    tahun, nbulan = periods[p] // 12, periods[p] % 12 + 1
+    daerah_arr = np.asarray(daerah, dtype=object)[d]
+    df = pd.DataFrame({
+        "Tahun": tahun,
+        "Bulan": pd.Series(nbulan).map(bulan_map).to_numpy(),
+        "nbulan": nbulan,
+        "Daerah": daerah_arr,
+        "Pulau": pd.Series(daerah_arr).map(daerah_to_pulau).fillna("Lainnya").to_numpy(),
+        "Produsen": brands["Produsen"].to_numpy()[b],
+        "Total": vol.ravel(),
+        "Kemasan": np.asarray(["Bag", "Bulk"], dtype=object)[k],
+        "Negara": "Domestik",
+        "Holding": brands["Holding"].to_numpy()[b],
+        "Merk": brands["Merk"].to_numpy()[b],
+    })[BASE_COLS]
+    # Sebagian kecil seri bolong di beberapa bulan, seperti data nyata
+    keep = np.random.default_rng(seed).random(len(df)) >= gap_frac
+    df = df[keep].reset_index(drop=True)
+    return df.merge(mapping_frame(universe), on=["Merk", "Daerah"], how="left")
+
+def mapping_frame(universe: dict) -> pd.DataFrame:
+    """Mapping (Merk, Daerah) → Segment, Area AP."""
+    daerah, brands = universe["daerah"], universe["brands"]
+    rows = [{"Merk": m, "Daerah": d,
+             "Segment": ("MB" if (i + j) % 3 else "FB") + " SIG",
+             "Area AP": j % 4 + 1}
+            for i, m in enumerate(brands["Merk"]) for j, d in enumerate(daerah)]
+    return pd.DataFrame(rows)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generator data sintetis (Data Bulanan, Database, Mapping).")
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--provinces", type=int, default=34)
+    parser.add_argument("--producers", type=int, default=10)
+    parser.add_argument("--brands", type=int, default=3, help="Merk per produsen.")
+    parser.add_argument("--holdings", type=int, default=4)
+    parser.add_argument("--years", type=int, default=3, help="Tahun history di Database.")
+    parser.add_argument("--months", type=int, default=1, help="Jumlah file Data Bulanan setelah Database.")
+    parser.add_argument("--end", default="2025-12", help="Periode terakhir Database (YYYY-MM).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    universe = make_universe(args.producers, args.brands, args.holdings, args.provinces)
+    tahun, nbulan = (int(x) for x in args.end.split("-"))
+    os.makedirs(args.out_dir, exist_ok=True)
+    db = database_frame(universe, years=args.years, end=(tahun, nbulan), seed=args.seed)
+    with open(os.path.join(args.out_dir, "Database.xlsx"), "wb") as f:
+        f.write(write_xlsx_streaming(db, "Sheet1"))
+    with open(os.path.join(args.out_dir, "Mapping.xlsx"), "wb") as f:
+        f.write(write_xlsx_streaming(mapping_frame(universe), "Sheet1"))
+    periode = tahun * 12 + nbulan - 1
+    for i in range(1, args.months + 1):
+        y, m = divmod(periode + i, 12)
+        with open(os.path.join(args.out_dir, f"Data_{y}_{m + 1:02d}.xlsx"), "wb") as f:
+            f.write(monthly_workbook(universe, seed=args.seed + i))
+    print(f"Database {len(db):,} baris, {args.months} file bulanan → {args.out_dir}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Root conftest: pytest menambahkan folder ini ke sys.path, jadi tests/ bisa `import engine`.
@@ -0,0 +1,1397 @@
+"""Engine Market Share: unpivot, parsing angka, MS & growth, history store.
+
+Bebas dari Streamlit — dipakai oleh main.py & jaga.py (UI) maupun batch.py (CLI).
+pandas, numpy & openpyxl baru di-import saat pertama dipakai, jadi
+`import engine` (worker, CLI --help, koleksi test) tetap ringan.
+"""
+from __future__ import annotations
+
+import re
+import io
+import os
+import hashlib
+import importlib
+import json
+import shutil
+import tempfile
+import sqlite3
+import time
+import datetime
+import threading
+import tracemalloc
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+class lazy_module:
+    """Proxy modul: `import` baru dijalankan saat atribut pertama diakses.
+
+    Atribut yang sudah diambil disimpan di proxy, jadi akses berikutnya
+    secepat akses modul biasa.
+    """
+
+    def __init__(self, name: str):
+        self._lazy_name = name
+
+    def __getattr__(self, attr: str):
+        value = getattr(importlib.import_module(self._lazy_name), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._lazy_name!r}>"
+
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+
+# =========================
+# KONFIGURASI HEADER & DATA
+# =========================
+# (index pandas 0-based; Excel rows: 6,7,52,53,8)
+ROW_PRODUSEN   = 6  - 1   # row 6 -> index 5
+ROW_KEMASAN    = 7  - 1   # row 7 -> index 6
+ROW_MERK       = 52 - 1   # row 52 -> index 51
+ROW_HOLDING    = 53 - 1   # row 53 -> index 52
+ROW_DATA_START = 8  - 1   # row 8 -> index 7
+
+BASE_COLS = [
+    "Tahun","Bulan","nbulan","Daerah","Pulau","Produsen",
+    "Total","Kemasan","Negara","Holding","Merk"
+]
+
+# Mapping pulau & nama bulan
+daerah_to_pulau = {
+    "D.I. Aceh":"Sumatera","Sumut":"Sumatera","Sumbar":"Sumatera","Riau":"Sumatera",
+    "Kepulauan Riau":"Sumatera","Jambi":"Sumatera","Sumsel":"Sumatera",
+    "Bangka - Belitung":"Sumatera","Bengkulu":"Sumatera","Lampung":"Sumatera",
+    "D. K. I. Jakarta":"Jawa","Banten":"Jawa","Jabar":"Jawa","Jateng":"Jawa","D. I. Y.":"Jawa","Jatim":"Jawa",
+    "Kalbar":"Kalimantan","Kalsel":"Kalimantan","Kalteng":"Kalimantan","Kaltim":"Kalimantan","Kaltara":"Kalimantan",
+    "Sultera":"Sulawesi","Sulsel":"Sulawesi","Sulbar":"Sulawesi","Sulteng":"Sulawesi","Sulut":"Sulawesi","Gorontalo":"Sulawesi",
+    "Bali":"Bali Nusra","N. T. B.":"Bali Nusra","N. T. T.":"Bali Nusra",
+    "Maluku":"Ind. Timur","Maluku Utara":"Ind. Timur","Papua Barat":"Ind. Timur","Papua":"Ind. Timur"
+}
+bulan_map = {1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"Mei",6:"Jun",7:"Jul",8:"Agt",9:"Sep",10:"Okt",11:"Nov",12:"Des"}
+
+# ==========================
+# URUTAN KUSTOM: DAEARAH
+# ==========================
+DAERAH_ORDER = [
+    "D.I. Aceh","Sumut","Sumbar","Riau","Kepulauan Riau","Jambi","Sumsel","Bangka - Belitung","Bengkulu","Lampung",
+    "D. K. I. Jakarta","Banten","Jabar","Jateng","D. I. Y.","Jatim",
+    "Kalbar","Kalsel","Kalteng","Kaltim","Kaltara",
+    "Sultera","Sulsel","Sulbar","Sulteng","Sulut","Gorontalo",
+    "Bali","N. T. B.","N. T. T.",
+    "Maluku","Maluku Utara","Papua Barat","Papua"
+]
+
+def apply_daerah_order(df: pd.DataFrame, keep_unknown: bool = False) -> pd.DataFrame:
+    """Set kolom Daerah sebagai kategori berurutan sesuai DAERAH_ORDER.
+
+    Daerah di luar DAERAH_ORDER menjadi NaN, kecuali `keep_unknown=True`:
+    teksnya dipertahankan dan diurutkan (alfabetis) setelah DAERAH_ORDER.
+    """
+    if "Daerah" in df.columns:
+        daerah = df["Daerah"].astype(str).str.strip()
+        order = DAERAH_ORDER
+        if keep_unknown:
+            order = order + unknown_daerah(daerah)
+        daerah = daerah.where(daerah.isin(order))
+        df["Daerah"] = daerah.astype(pd.CategoricalDtype(categories=order, ordered=True))
+    return df
+
+def unknown_daerah(daerah: pd.Series) -> list:
+    """Nilai Daerah (tidak kosong) yang tidak ada di DAERAH_ORDER."""
+    daerah = daerah.dropna().astype(str).str.strip()
+    return sorted(set(daerah[daerah.ne("")]) - set(DAERAH_ORDER))
+
+# ==========
+# UTILITIES
+# ==========
+def header_text(df: pd.DataFrame, r: int, c: int) -> str:
+    """Ambil isi sel dari grid mentah, aman terhadap NaN & Out of Range."""
+    try:
+        v = df.iat[r, c]
+    except Exception:
+        return ""
+    return "" if pd.isna(v) else str(v)
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def clean_text(s: str) -> str:
+    return str(s).strip()
+
+def clean_kemasan(s: str) -> str:
+    s = clean_text(s)
+    if s.lower() in ["curah", "bulk"]:
+        return "Bulk"
+    if s.lower() in ["bag", "zak"]:
+        return "Bag"
+    return s
+
+# Pola angka (dipakai to_number & to_numeric_series)
+RE_EROPA = re.compile(r"^\d{1,3}(?:\.\d{3})+,\d+$")   # 1.234,56 → 1234.56
+RE_INTL  = re.compile(r"^\d{1,3}(?:,\d{3})+\.\d+$")   # 1,234.56 → 1234.56
+RE_KOMA  = re.compile(r"^\d+,\d+$")                    # 1067,367 → 1067.367
+
+# ✅ FIXED: parsing angka
+def to_number(v) -> float:
+    if pd.isna(v): 
+        return 0.0
+    s = str(v).strip()
+    if s in ("", "-"): 
+        return 0.0
+
+    # --- Normalisasi angka ---
+    # Format Eropa: 1.234,56 → 1234.56
+    if RE_EROPA.match(s):
+        s = s.replace(".", "").replace(",", ".")
+    # Format Internasional: 1,234.56 → 1234.56
+    elif RE_INTL.match(s):
+        s = s.replace(",", "")
+    # Desimal dengan koma: 1067,367 → 1067.367
+    elif RE_KOMA.match(s):
+        s = s.replace(",", ".")
+    # Angka biasa (1067.367 atau 1067) → langsung
+
+    return _float_or_zero(s)
+
+def _float_or_zero(s: str) -> float:
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+def stop_at_this_column(df: pd.DataFrame, col: int) -> bool:
+    v = header_text(df, ROW_DATA_START, col)
+    return (v.strip() == "" or v.strip() == "-")
+
+def find_col_provinsi(df: pd.DataFrame, max_col: int):
+    for c in range(0, max_col+1):
+        t6  = header_text(df, ROW_PRODUSEN, c).replace(" ", "").upper()
+        t7  = header_text(df, ROW_KEMASAN,  c).replace(" ", "").upper()
+        t52 = header_text(df, ROW_MERK,     c).replace(" ", "").upper()
+        if "PROVINSI" in t6 or "PROVINSI" in t7 or "PROVINSI" in t52:
+            return c
+    return None
+
+def _float_or_nan(v) -> float:
+    """float(str(v)); str() dilewati untuk str / float / int (hasilnya sama)."""
+    try:
+        return float(v if isinstance(v, (str, float, int)) else str(v))
+    except ValueError:
+        return np.nan
+
+def _floats(values, fn) -> np.ndarray:
+    return np.fromiter(map(fn, values), dtype=float, count=len(values))
+
+def to_numeric_series(s: pd.Series) -> pd.Series:
+    """Versi vektor dari to_number: hasil per elemen identik, diproses per kolom.
+
+    Teks di-parse dengan float() (pembulatan benar); parser teks pd.to_numeric
+    bisa meleset 1 ulp untuk angka 16-17 digit.
+    """
+    s = pd.Series(s)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s.astype(float).fillna(0.0)
+    index = s.index
+    s = s.reset_index(drop=True)
+
+    # Jalur cepat: angka & teks angka biasa (to_number = float(str(v)))
+    na = s.isna()
+    out = pd.Series(_floats(s.to_numpy(dtype=object), _float_or_nan), index=s.index)
+    out[na] = 0.0
+    # float(True) = 1, tapi float("True") gagal → 0
+    cek = out.isin([0.0, 1.0]) & ~na
+    if cek.any():
+        is_bool = s[cek].map(lambda v: isinstance(v, (bool, np.bool_))).astype(bool)
+        out[is_bool.index[is_bool]] = 0.0
+
+    # Sisanya (format dengan koma, '-', kosong, 'nan', teks) lewat pola regex
+    rest = out.isna() & ~na
+    if rest.any():
+        t = s[rest].map(str).astype(object).str.strip()   # str(v) seperti to_number (astype(str) men-decode bytes)
+        ada_koma = t.str.contains(",", regex=False).astype(bool)
+        eropa = ada_koma & t.str.match(RE_EROPA).astype(bool)
+        intl  = ada_koma & ~eropa & t.str.match(RE_INTL).astype(bool)
+        koma  = ada_koma & ~eropa & ~intl & t.str.match(RE_KOMA).astype(bool)
+        t[eropa] = t[eropa].str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        t[intl]  = t[intl].str.replace(",", "", regex=False)
+        t[koma]  = t[koma].str.replace(",", ".", regex=False)
+        t = t.mask(t.isin(["", "-"]), "0")
+        # '1_000', teks bebas, dst. → aturan float() seperti to_number
+        out[rest] = _floats(t.to_numpy(dtype=object), _float_or_zero)
+    return out.set_axis(index)
+
+def safe_select(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    return df[[c for c in cols if c in df.columns]].copy()
+
+# ===================================
+# PEMBACA SHEET (openpyxl read-only)
+# ===================================
+# Nilai sel disamakan dengan pd.read_excel(header=None, dtype=str): kosong,
+# teks NA bawaan pandas & error Excel → NaN; angka bulat → int.
+NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    # kode error Excel (openpyxl ERROR_CODES)
+    "#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!",
+])
+
+def excel_cell_value(v):
+    if v is None:
+        return np.nan
+    if isinstance(v, str):
+        return np.nan if v in NA_STRINGS else v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, (bool, int, float)):
+        return v
+    return str(v)
+
+def _cell_text(row: list, c: int) -> str:
+    v = row[c] if c < len(row) else np.nan
+    return "" if pd.isna(v) else str(v)
+
+def read_sheet_grid(xlsx_bytes: bytes, sheet_name=0) -> pd.DataFrame:
+    """Grid mentah sheet (seperti header=None), hanya bagian yang dipakai unpivot.
+
+    Dibaca streaming (read_only, values_only): kolom dipotong di sel terakhir
+    row 7 (Kemasan) dan pembacaan berhenti setelah row 53 (Holding) sekaligus
+    footer data (CATATAN / 2 baris kosong) tercapai.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(xlsx_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        ws.reset_dimensions()
+        rows, width = [], None
+        col_prov, scan, blank_run = None, ROW_DATA_START, 0
+        for r, values in enumerate(ws.iter_rows(values_only=True)):
+            rows.append([excel_cell_value(v) for v in values[:width]])
+            if r == ROW_KEMASAN:
+                valid = [c for c, v in enumerate(rows[r]) if not pd.isna(v)]
+                width = valid[-1] + 1 if valid else 0
+                rows = [row[:width] for row in rows]
+            if r < ROW_HOLDING:
+                continue
+            if col_prov is None:
+                col_prov = find_col_provinsi(pd.DataFrame(rows), width - 1)
+                if col_prov is None:
+                    break
+            # Footer: sama dengan aturan find_data_rows
+            stop = False
+            while scan <= r and not stop:
+                daerah = clean_text(_cell_text(rows[scan], col_prov))
+                if daerah.upper().startswith("CATATAN"):
+                    stop = True
+                elif daerah == "":
+                    blank_run += 1
+                    stop = blank_run >= 2
+                else:
+                    blank_run = 0
+                scan += 1
+            if stop:
+                break
+    finally:
+        wb.close()
+    return pd.DataFrame(rows, dtype=object)
+
+# ==============================
+# UNPIVOT: PRODUSEN-HOLDING-MERK
+# ==============================
+def build_column_headers(df: pd.DataFrame, first_data_col: int, max_col: int) -> pd.DataFrame:
+    """Tabel header per kolom data (row 6/7/52/53), dibangun sekali per sheet.
+
+    Berhenti di kolom stop (row 8 kosong / '-'). Hanya kolom dengan Produsen
+    terisi dan Kemasan Bag/Bulk yang disimpan, lengkap dengan OrderKey dasar
+    (urutan kemunculan Produsen, mulai 1).
+    """
+    cols, produsen, kemasan, merk, holding = [], [], [], [], []
+    for c in range(first_data_col, max_col + 1):
+        if stop_at_this_column(df, c):
+            break
+        prod = clean_text(header_text(df, ROW_PRODUSEN, c))
+        kem  = clean_kemasan(header_text(df, ROW_KEMASAN, c))
+        if prod and kem in ("Bag", "Bulk"):
+            cols.append(c)
+            produsen.append(prod)
+            kemasan.append(kem)
+            merk.append(clean_text(header_text(df, ROW_MERK, c)))
+            holding.append(clean_text(header_text(df, ROW_HOLDING, c)))
+
+    headers = pd.DataFrame({
+        "col": cols, "Produsen": produsen, "Kemasan": kemasan,
+        "Merk": merk, "Holding": holding,
+    })
+    produsen_to_idx = {p: i+1 for i, p in enumerate(dict.fromkeys(produsen))}
+    headers["ProdusenIdx"] = headers["Produsen"].map(produsen_to_idx).astype("int64")
+    return headers
+
+def find_data_rows(df: pd.DataFrame, col_prov: int):
+    """Baris data (index, Daerah) mulai row 8 hingga CATATAN / 2 baris kosong; baris TOTAL dilewati."""
+    rows, daerah_list = [], []
+    blank_run = 0
+    for r in range(ROW_DATA_START, df.shape[0]):
+        daerah = clean_text(header_text(df, r, col_prov))
+        if daerah.upper().startswith("CATATAN"):
+            break
+        if daerah == "":
+            blank_run += 1
+            if blank_run >= 2:
+                break
+            continue
+        blank_run = 0
+        if daerah.upper().startswith("TOTAL"):
+            continue
+        rows.append(r)
+        daerah_list.append(daerah)
+    return rows, daerah_list
+
+def unpivot_produsen_holding_merk(xlsx_bytes: bytes, sheet_name=0) -> pd.DataFrame:
+    df = read_sheet_grid(xlsx_bytes, sheet_name=sheet_name)
+    if df.shape[1] == 0:
+        raise ValueError("Sheet kosong.")
+
+    last = df.iloc[ROW_KEMASAN].last_valid_index() if df.shape[0] > ROW_KEMASAN else None
+    max_col = int(last) if last is not None else -1
+    if max_col < 0:
+        raise ValueError("Baris kemasan (row 7) kosong / tidak ditemukan.")
+
+    col_prov = find_col_provinsi(df, max_col)
+    if col_prov is None:
+        raise ValueError("Kolom 'Provinsi' tidak ditemukan di row 6/7/52.")
+
+    headers = build_column_headers(df, col_prov + 1, max_col)
+    rows, daerah_list = find_data_rows(df, col_prov)
+
+    # Blok data (baris x kolom) direshape sekali: Bag dulu lalu Bulk,
+    # per pass urut baris lalu kolom (sama dengan urutan loop sel lama).
+    block = df.to_numpy(dtype=object)[np.ix_(np.asarray(rows, dtype=np.intp),
+                                              headers["col"].to_numpy(dtype=np.intp))]
+    daerah_arr = np.asarray(daerah_list, dtype=object)
+    parts = []
+    for pass_type, type_rank in (("Bag", 0), ("Bulk", 100)):
+        sel = (headers["Kemasan"] == pass_type).to_numpy()
+        n_cols = int(sel.sum())
+        if n_cols == 0 or len(rows) == 0:
+            continue
+        h = headers.loc[sel]
+        n_rows = len(rows)
+        parts.append(pd.DataFrame({
+            "Daerah":   np.repeat(daerah_arr, n_cols),
+            "Kemasan":  np.tile(h["Kemasan"].to_numpy(dtype=object), n_rows),
+            "Produsen": np.tile(h["Produsen"].to_numpy(dtype=object), n_rows),
+            "Holding":  np.tile(h["Holding"].to_numpy(dtype=object), n_rows),
+            "Merk":     np.tile(h["Merk"].to_numpy(dtype=object), n_rows),
+            "Total":    to_numeric_series(pd.Series(block[:, sel].ravel(), dtype=object)).to_numpy(),
+            "OrderKey": np.tile(h["ProdusenIdx"].to_numpy() + type_rank, n_rows),
+        }))
+
+    if not parts:
+        return pd.DataFrame.from_records([])
+    out = pd.concat(parts, ignore_index=True)
+    out = out.sort_values(["Daerah", "OrderKey"], kind="mergesort").reset_index(drop=True)
+    return out
+
+def _unpivot_sheet(xlsx_bytes: bytes, sheet_name) -> pd.DataFrame:
+    """Unpivot satu sheet + kolom Sheet (worker process pool)."""
+    try:
+        out = unpivot_produsen_holding_merk(xlsx_bytes, sheet_name=sheet_name)
+    except Exception as e:
+        raise ValueError(f"Sheet '{sheet_name}': {e}") from None
+    out["Sheet"] = str(sheet_name)
+    return out
+
+def unpivot_sheets(xlsx_bytes: bytes, sheet_names: list, workers: int = None) -> pd.DataFrame:
+    """Unpivot beberapa sheet ber-layout sama sekaligus, paralel di process pool.
+
+    Tiap baris diberi kolom Sheet; hasil digabung sesuai urutan `sheet_names`.
+    Default worker = jumlah core (maks. jumlah sheet); 1 worker = berurutan.
+    """
+    sheet_names = list(sheet_names)
+    workers = min(workers or os.cpu_count() or 1, len(sheet_names))
+    if workers <= 1:
+        parts = [_unpivot_sheet(xlsx_bytes, s) for s in sheet_names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_unpivot_sheet, [xlsx_bytes] * len(sheet_names), sheet_names))
+    if not parts:
+        return pd.DataFrame.from_records([])
+    return pd.concat(parts, ignore_index=True)
+
+# ========================
+# HITUNG MS & PERTUMBUHAN
+# ========================
+SERIES_KEYS = ["Merk","Daerah","Kemasan"]
+
+def calendar_growth(df: pd.DataFrame, value_col: str = "MS", keys: list = None) -> pd.DataFrame:
+    """MoM / YoY / YtD berbasis kalender untuk tiap seri (default SERIES_KEYS).
+
+    Tiap seri dipetakan ke array padat [seri x periode], periode = Tahun*12 +
+    nbulan (mulai Jan tahun pertama). Lag = geser kolom (1 / 12 bulan), YtD =
+    cumsum per tahun. Bulan yang tidak ada tetap kosong, sehingga pembanding
+    selalu bulan kalender yang benar (NaN bila bulan itu tidak ada).
+    nbulan di luar 1..12 → ValueError (align_with_history sudah membuangnya).
+    """
+    n = len(df)
+    out = pd.DataFrame(index=df.index)
+    if n == 0:
+        for col in ["MoM Growth %","YoY Growth %","MS_YTD","YtD Growth %"]:
+            out[col] = pd.Series(dtype=float)
+        return out
+
+    sid = df.groupby(keys or SERIES_KEYS, sort=False, observed=True).ngroup().to_numpy()
+    tahun = df["Tahun"].to_numpy().astype(np.int64)
+    nbulan = df["nbulan"].to_numpy().astype(np.int64)
+    bad = (nbulan < 1) | (nbulan > 12)
+    if bad.any():
+        contoh = ", ".join(f"{t}/{b}" for t, b in sorted(set(zip(tahun[bad].tolist(), nbulan[bad].tolist())))[:5])
+        raise ValueError(f"nbulan harus 1..12: {int(bad.sum()):,} baris di luar rentang "
+                         f"(Tahun/nbulan: {contoh})")
+    y0 = int(tahun.min())
+    n_years = int(tahun.max()) - y0 + 1
+    n_series = int(sid.max()) + 1
+    n_per = n_years * 12
+    flat = sid * n_per + (tahun - y0) * 12 + (nbulan - 1)
+
+    vals = df[value_col].to_numpy(dtype=float)
+    present = np.bincount(flat, minlength=n_series * n_per) > 0
+    grid = np.bincount(flat, weights=vals, minlength=n_series * n_per)
+    grid[~present] = np.nan
+    grid = grid.reshape(n_series, n_per)
+
+    # YtD: cumsum per tahun (bulan kosong = 0), hanya terisi di bulan yang ada
+    ytd = np.nan_to_num(grid).reshape(n_series, n_years, 12).cumsum(axis=2).reshape(n_series, n_per)
+    ytd[np.isnan(grid)] = np.nan
+
+    def pct_change(a: np.ndarray, lag: int) -> np.ndarray:
+        prev = np.full_like(a, np.nan)
+        prev[:, lag:] = a[:, :-lag]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return a / prev - 1
+
+    flat_mom = pct_change(grid, 1).ravel()
+    flat_yoy = pct_change(grid, 12).ravel()
+    flat_ytd_g = pct_change(ytd, 12).ravel()
+    out["MoM Growth %"] = flat_mom[flat]
+    out["YoY Growth %"] = flat_yoy[flat]
+    out["MS_YTD"] = ytd.ravel()[flat]
+    out["YtD Growth %"] = flat_ytd_g[flat]
+    return out
+
+def calc_ms_and_growth(df: pd.DataFrame) -> pd.DataFrame:
+    # Satu sort: urutan hasil & urutan cumsum Total Merk YtD dalam bulan yang sama
+    # (Kemasan, lalu urutan groupby) sama seperti rantai sort sebelumnya.
+    df = (df.groupby(BASE_COLS, as_index=False, observed=True)["Total"].sum()
+            .sort_values(["Daerah","Merk","Tahun","nbulan","Kemasan"], kind="mergesort")
+            .reset_index(drop=True))
+    total_per_period = df.groupby(["Tahun","Bulan","Daerah"], observed=True)["Total"].transform("sum")
+    df["MS"] = df["Total"] / total_per_period
+
+    growth = calendar_growth(df, "MS")
+    for col in growth.columns:
+        df[col] = growth[col]
+
+    df["Total Merk YtD"] = df.groupby(["Daerah","Merk","Tahun"], observed=True)["Total"].cumsum()
+    total_all = (
+        df.groupby(["Daerah","Tahun","nbulan"], observed=True)["Total"].sum()
+          .groupby(level=["Daerah","Tahun"], observed=True).cumsum().reset_index(name="Total All YtD")
+    )
+    df = df.merge(total_all, on=["Daerah","Tahun","nbulan"], how="left")
+    df["MSY"] = df["Total Merk YtD"] / df["Total All YtD"]
+
+    for col in ["MoM Growth %","YoY Growth %","YtD Growth %"]:
+        df[col] = df[col].replace([float("inf"), float("-inf")], 1.0)
+    return df
+
+GROWTH_COLS = ["MS","MoM Growth %","YoY Growth %","YtD Growth %",
+               "Total Merk YtD","Total All YtD","MSY"]
+
+def periode_index(df: pd.DataFrame) -> pd.Series:
+    """Tahun*12 + nbulan per baris; NaN bila Tahun / nbulan kosong (mis. baris total)
+    atau nbulan di luar 1..12."""
+    nbulan = pd.to_numeric(df["nbulan"], errors="coerce")
+    return pd.to_numeric(df["Tahun"], errors="coerce") * 12 + nbulan.where(nbulan.between(1, 12))
+
+def incremental_window_start(tahun: int, nbulan: int) -> tuple:
+    """Periode history paling awal yang dibutuhkan untuk menghitung (tahun, nbulan).
+
+    Bulan lalu, bulan yang sama tahun lalu dan YtD tahun ini maupun tahun lalu
+    semuanya berada di rentang Jan tahun lalu s/d bulan ini.
+    """
+    return (int(tahun) - 1, 1)
+
+def calc_ms_and_growth_incremental(history: pd.DataFrame, current: pd.DataFrame,
+                                   verify: bool = False) -> pd.DataFrame:
+    """MS & growth hanya untuk periode `current` (satu Tahun/nbulan).
+
+    `history` = data tanpa periode bulan ini; hanya jendela
+    incremental_window_start s/d bulan ini yang ikut dihitung. Dengan
+    `verify=True` hasilnya dicek terhadap calc_ms_and_growth penuh.
+    """
+    y_now = int(current["Tahun"].max())
+    m_now = int(current.loc[current["Tahun"].eq(y_now), "nbulan"].max())
+    y0, m0 = incremental_window_start(y_now, m_now)
+    # Periode kosong → NaN → di luar jendela
+    window = history[periode_index(history).between(y0 * 12 + m0, y_now * 12 + m_now - 1)]
+
+    def periode_ini(res: pd.DataFrame) -> pd.DataFrame:
+        res = res[(res["Tahun"] == y_now) & (res["nbulan"] == m_now)]
+        return res.sort_values(BASE_COLS).reset_index(drop=True)
+
+    out = periode_ini(calc_ms_and_growth(pd.concat([window, current], ignore_index=True)))
+    if verify:
+        full = periode_ini(calc_ms_and_growth(pd.concat([history, current], ignore_index=True)))
+        cols = BASE_COLS + GROWTH_COLS
+        beda = len(out) != len(full)
+        if not beda:
+            a = out[cols].astype({c: object for c in BASE_COLS})
+            b = full[cols].astype({c: object for c in BASE_COLS})
+            beda = not (a[BASE_COLS].equals(b[BASE_COLS]) and np.allclose(
+                a[GROWTH_COLS].to_numpy(float), b[GROWTH_COLS].to_numpy(float),
+                rtol=1e-9, atol=0.0, equal_nan=True))
+        if beda:
+            raise ValueError(f"Verifikasi inkremental gagal untuk {y_now}-{m_now:02d}: "
+                             "hasil berbeda dari full recompute.")
+    return out
+
+# =============================
+# HISTORY STORE (SQLite lokal)
+# =============================
+# Pengganti upload Database xlsx tiap bulan: satu tabel "history" dengan
+# index (Tahun, nbulan). Satu periode = satu partisi; menulis periode yang
+# sudah ada = overwrite partisi tsb (replace mode).
+HISTORY_DB_PATH = os.environ.get("MS_HISTORY_DB", "history.sqlite")
+HISTORY_TABLE   = "history"
+HISTORY_COLS    = BASE_COLS + ["Segment", "Area AP"]
+HISTORY_TYPES   = {"Tahun": "INTEGER", "nbulan": "INTEGER", "Total": "REAL"}
+
+def _sql_name(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def history_connect(path: str = HISTORY_DB_PATH) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    cols = ", ".join(f"{_sql_name(c)} {HISTORY_TYPES.get(c, '')}".strip() for c in HISTORY_COLS)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} ({cols})")
+    con.execute(f"CREATE INDEX IF NOT EXISTS ix_{HISTORY_TABLE}_periode ON {HISTORY_TABLE} (Tahun, nbulan)")
+    return con
+
+def history_periods(path: str = HISTORY_DB_PATH) -> pd.DataFrame:
+    """Daftar periode yang tersimpan beserta jumlah barisnya."""
+    with closing(history_connect(path)) as con:
+        return pd.read_sql_query(
+            f"SELECT Tahun, nbulan, COUNT(*) AS Baris FROM {HISTORY_TABLE} "
+            "GROUP BY Tahun, nbulan ORDER BY Tahun, nbulan", con)
+
+def history_load(path: str = HISTORY_DB_PATH, columns: list = None,
+                 since: tuple = None, exclude: tuple = None) -> pd.DataFrame:
+    """Baca history; hanya kolom `columns` dan periode >= `since` (Tahun, nbulan).
+
+    `exclude` (Tahun, nbulan) dilewati — dipakai saat periode itu akan diganti.
+    """
+    cols = [c for c in (columns or HISTORY_COLS) if c in HISTORY_COLS]
+    where, params = [], []
+    if since is not None:
+        where.append("(Tahun * 12 + nbulan) >= ?")
+        params.append(int(since[0]) * 12 + int(since[1]))
+    if exclude is not None:
+        where.append("NOT (Tahun = ? AND nbulan = ?)")
+        params += [int(exclude[0]), int(exclude[1])]
+    sql = f"SELECT {', '.join(_sql_name(c) for c in cols)} FROM {HISTORY_TABLE}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with closing(history_connect(path)) as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+def history_write(df: pd.DataFrame, path: str = HISTORY_DB_PATH) -> int:
+    """Overwrite partisi (Tahun, nbulan) yang ada di `df`; return jumlah baris ditulis."""
+    cols = [c for c in HISTORY_COLS if c in df.columns]
+    if not {"Tahun", "nbulan"}.issubset(cols):
+        raise ValueError("Kolom Tahun / nbulan wajib ada untuk menulis history.")
+    data = df[cols].astype(object)
+    data = data.where(data.notna(), None)
+    periods = df[["Tahun", "nbulan"]].drop_duplicates().astype(int).itertuples(index=False)
+    insert = (f"INSERT INTO {HISTORY_TABLE} ({', '.join(_sql_name(c) for c in cols)}) "
+              f"VALUES ({', '.join('?' * len(cols))})")
+    with closing(history_connect(path)) as con, con:
+        con.executemany(f"DELETE FROM {HISTORY_TABLE} WHERE Tahun = ? AND nbulan = ?",
+                        [tuple(p) for p in periods])
+        con.executemany(insert, data.itertuples(index=False, name=None))
+    return len(data)
+
+# =====================================
+# PEMBACA DATABASE XLSX (streaming)
+# =====================================
+# Pengganti pd.read_excel untuk Database multi-tahun: dibaca read_only per
+# chunk, hanya kolom `columns` dan periode yang dibutuhkan; tiap chunk
+# langsung dikompakkan (label → kategori, Total → float) sehingga puncak
+# memori ≈ satu chunk mentah + hasil kompak, bukan seluruh sheet.
+DB_CHUNK_ROWS = 50_000
+
+def _compact_chunk(rows: list, names: list, since: int, exclude: int) -> pd.DataFrame:
+    chunk = pd.DataFrame(rows, columns=names, dtype=object)
+    chunk = chunk.mask(chunk.isin(NA_STRINGS))
+    if (since is not None or exclude is not None) and {"Tahun", "nbulan"}.issubset(names):
+        periode = pd.to_numeric(chunk["Tahun"], errors="coerce") * 12 + pd.to_numeric(chunk["nbulan"], errors="coerce")
+        keep = periode.notna()
+        if since is not None:
+            keep &= periode >= since
+        if exclude is not None:
+            keep &= periode != exclude
+        chunk = chunk[keep.to_numpy()]
+    for col in names:
+        if col == "Total":
+            chunk[col] = to_numeric_series(chunk[col])
+        elif col in LABEL_COLS:
+            chunk[col] = chunk[col].astype("category")
+        else:
+            chunk[col] = chunk[col].infer_objects()
+    return chunk
+
+def read_database_xlsx(xlsx_bytes: bytes, columns: list = None, since: tuple = None,
+                       exclude: tuple = None, sheet_name=0, chunk_rows: int = DB_CHUNK_ROWS) -> pd.DataFrame:
+    """Baca Database xlsx (header baris 1) seperti history_load: kolom & periode terpilih.
+
+    `since` / `exclude` (Tahun, nbulan) sama artinya dengan history_load; baris
+    di luar jendela dibuang per chunk. Kolom Total sudah numerik.
+    """
+    import openpyxl
+    from operator import itemgetter
+    columns = columns or HISTORY_COLS
+    since_p = int(since[0]) * 12 + int(since[1]) if since is not None else None
+    exclude_p = int(exclude[0]) * 12 + int(exclude[1]) if exclude is not None else None
+    wb = openpyxl.load_workbook(io.BytesIO(xlsx_bytes), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        ws.reset_dimensions()
+        rows_iter = ws.iter_rows(values_only=True)
+        header = [None if h is None else str(h) for h in next(rows_iter, ())]
+        wanted, pos = set(columns), {}
+        for i, h in enumerate(header):
+            if h in wanted:
+                pos.setdefault(h, i)   # nama ganda: kolom pertama, urutan header
+        if not pos:
+            raise ValueError(f"Kolom Database tidak ditemukan di header (butuh: {', '.join(columns)})")
+        names, idx = list(pos), list(pos.values())
+        get, single = itemgetter(*idx), len(idx) == 1
+        chunks, rows = [], []
+        for row in rows_iter:
+            try:
+                values = (get(row),) if single else get(row)
+            except IndexError:   # baris lebih pendek dari header
+                values = tuple(row[i] if i < len(row) else None for i in idx)
+            if any(v is not None for v in values):
+                rows.append(values)
+            if len(rows) >= chunk_rows:
+                chunks.append(_compact_chunk(rows, names, since_p, exclude_p))
+                rows = []
+        if rows or not chunks:
+            chunks.append(_compact_chunk(rows, names, since_p, exclude_p))
+    finally:
+        wb.close()
+    chunks = compact_schema(chunks)
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0].reset_index(drop=True)
+
+# ==========================
+# SKEMA KOMPAK (dtype)
+# ==========================
+# Kolom label → kategori dengan kamus bersama untuk Database & data baru
+# (concat tetap kategori, groupby/sort/merge pakai kode integer).
+# Kategori diurutkan leksikal agar urutan hasil sama dengan kolom string;
+# Daerah mengikuti DAERAH_ORDER, Bulan mengikuti urutan bulan.
+LABEL_COLS = ["Bulan","Daerah","Pulau","Produsen","Kemasan","Negara","Holding","Merk","Segment","Area AP"]
+INT_COLS   = {"Tahun": "int16", "nbulan": "int8"}
+LABEL_HEAD = {"Daerah": DAERAH_ORDER, "Bulan": list(bulan_map.values())}
+
+def _label_categories(series: list, head: list = None) -> list:
+    """Gabungan nilai unik (tanpa NaN) dari beberapa kolom; `head` di depan."""
+    uniq = pd.Index(np.concatenate([np.asarray(s.dropna().unique(), dtype=object) for s in series]))
+    uniq = uniq.unique()
+    try:
+        uniq = uniq.sort_values()
+    except TypeError:   # campuran angka & teks: biarkan urutan kemunculan
+        pass
+    if head is None:
+        return list(uniq)
+    known = set(head)
+    return list(head) + [v for v in uniq if v not in known]
+
+def _small_int(s: pd.Series, dtype: str) -> pd.Series:
+    """Downcast ke integer kecil bila semua nilai bulat & tidak kosong."""
+    v = pd.to_numeric(s, errors="coerce")
+    if len(v) and v.notna().all() and (v == v.round()).all():
+        return v.astype(dtype)
+    return s
+
+def compact_schema(frames: list, float32: bool = False) -> list:
+    """Terapkan skema kompak ke beberapa frame sekaligus (kamus kategori bersama).
+
+    Label → kategori, Tahun/nbulan → int16/int8, dan bila `float32=True`
+    kolom metrik (Total & hasil MS) → float32. Kolom yang sudah sesuai
+    tidak dikonversi ulang. float32 hanya untuk hitung — jangan ditulis ke
+    history store (presisi ~7 digit).
+    """
+    frames = [f.copy(deep=False) for f in frames]
+    for col in LABEL_COLS:
+        parts = [f[col] for f in frames if col in f.columns]
+        if not parts:
+            continue
+        ordered = col in LABEL_HEAD
+        cat = pd.CategoricalDtype(_label_categories(parts, LABEL_HEAD.get(col)), ordered=ordered)
+        for f in frames:
+            if col in f.columns and f[col].dtype != cat:
+                f[col] = f[col].astype(object).astype(cat)
+    for f in frames:
+        for col, dtype in INT_COLS.items():
+            if col in f.columns:
+                f[col] = _small_int(f[col], dtype)
+        if float32:
+            for col in ["Total"] + GROWTH_COLS:
+                if col in f.columns and pd.api.types.is_float_dtype(f[col]):
+                    f[col] = f[col].astype("float32")
+    return frames
+
+# ==========================
+# PIPELINE (Start Proses)
+# ==========================
+DESIRED_COLS = ["X","Tahun","Bulan","Daerah","Pulau","Produsen","Total",
+                "Kemasan","Negara","Holding","Merk","nbulan",
+                "MS","MoM Growth %","YoY Growth %","YtD Growth %",
+                "Total Merk YtD","Total All YtD","MSY"]
+
+def prepare_current(df_long: pd.DataFrame, tahun: int, nbulan: int) -> pd.DataFrame:
+    """Hasil unpivot + kolom periode (Tahun/nbulan/Bulan), Negara, Pulau; Total numerik."""
+    current = df_long.copy()
+    current["Tahun"]  = int(tahun)
+    current["nbulan"] = int(nbulan)
+    current["Bulan"]  = current["nbulan"].astype(int).map(bulan_map)
+    current["Negara"] = "Domestik"
+    if "Daerah" in current.columns:
+        current["Pulau"] = current["Daerah"].astype(str).map(daerah_to_pulau).fillna("Lainnya")
+    if "Total" in current.columns:
+        current["Total"] = to_numeric_series(current["Total"])
+    return safe_select(current, BASE_COLS)
+
+# Kolom hasil Mapping → kolom kunci lookup-nya
+MAPPING_KEYS = {"Segment": ["Merk","Daerah"], "Area AP": ["Daerah"]}
+
+def compile_mapping(mapping_df: pd.DataFrame) -> dict:
+    """Index lookup dari Mapping: {kolom: (kunci, level per kunci, tabel, nilai)}.
+
+    Tiap kunci difaktorkan ke level; `tabel` padat memetakan kombinasi kode
+    (Merk x Daerah) → baris nilai. Baris pertama per kunci yang dipakai
+    (sama dengan drop_duplicates). Cukup dibuat sekali per file Mapping.
+    """
+    index = {}
+    for col, keys in MAPPING_KEYS.items():
+        if not set(keys + [col]).issubset(mapping_df.columns):
+            continue
+        uniq = mapping_df.drop_duplicates(keys)
+        # NaN ikut jadi level: kunci kosong cocok dengan kunci kosong (seperti merge)
+        codes, levels = zip(*(pd.factorize(uniq[k], use_na_sentinel=False) for k in keys))
+        dims = tuple(len(level) for level in levels)
+        table = np.full(int(np.prod(dims)), -1, dtype=np.intp)
+        if len(uniq):
+            table[np.ravel_multi_index(np.vstack(codes), dims)] = np.arange(len(uniq))
+        index[col] = (keys, list(levels), table, uniq[col].array)
+    return index
+
+def _key_codes(s: pd.Series, level: pd.Index) -> np.ndarray:
+    """Kode tiap nilai s di `level` (-1 = tidak ada); kolom kategori dicari per kategori."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniq = s.cat.codes.to_numpy(), s.cat.categories
+        pos = np.append(level.get_indexer(uniq), level.get_indexer([np.nan]))   # kode -1 = NaN
+        return pos[codes]
+    codes, uniq = pd.factorize(s, use_na_sentinel=False)
+    return level.get_indexer(uniq)[codes]
+
+def _lookup_positions(df: pd.DataFrame, keys: list, levels: list, table: np.ndarray) -> np.ndarray:
+    """Baris nilai Mapping untuk tiap baris df (-1 = tidak ada)."""
+    flat = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    for k, level in zip(keys, levels):
+        c = _key_codes(df[k], level)
+        valid &= c >= 0
+        flat = flat * len(level) + c
+    if not table.size:
+        return np.full(len(df), -1, dtype=np.intp)
+    return np.where(valid, table[np.where(valid, flat, 0)], -1)
+
+def apply_mapping(df: pd.DataFrame, mapping) -> pd.DataFrame:
+    """Isi Segment (Merk, Daerah) & Area AP (Daerah) dari Mapping, bila kolomnya ada.
+
+    `mapping` = DataFrame Mapping atau hasil compile_mapping. Kolom yang sudah
+    ada ditimpa — dipakai juga untuk menerapkan ulang Mapping ke history.
+    """
+    if isinstance(mapping, pd.DataFrame):
+        mapping = compile_mapping(mapping)
+    assign = {}
+    for col, (keys, levels, table, values) in mapping.items():
+        if not set(keys).issubset(df.columns):
+            continue
+        # Posisi -1 → NaN (tidak ada di Mapping); dtype seperti merge: int tetap
+        # int bila semua kunci cocok, baru jadi float bila ada yang kosong
+        pos = _lookup_positions(df, keys, levels, table)
+        assign[col] = pd.api.extensions.take(values, pos, allow_fill=True)
+    return df.assign(**assign) if assign else df
+
+def align_with_history(db: pd.DataFrame, current_core: pd.DataFrame):
+    """Samakan kolom Database & data baru; periode yang ada di data baru dibuang dari DB.
+
+    Baris Database tanpa Tahun / nbulan (baris total, footer) atau dengan nbulan
+    di luar 1..12 ikut dibuang.
+
+    Keduanya diberi skema kompak yang sama (lihat compact_schema).
+    Return (db_clean, current_aligned, keep_cols).
+    """
+    if "Total" in db.columns:
+        db = db.assign(Total=to_numeric_series(db["Total"]))
+    available = set(db.columns) | set(current_core.columns)
+    keep_cols = [c for c in BASE_COLS + ["Segment","Area AP"] if c in available]
+    db_aligned = safe_select(db, keep_cols)
+    if {"Tahun","nbulan"}.issubset(db_aligned.columns):
+        # Baris tanpa periode (total / footer) tidak pernah masuk hasil (groupby
+        # membuangnya); dibuang di sini agar Tahun/nbulan tetap integer. nbulan
+        # di luar 1..12 tidak punya tempat di kalender (calendar_growth) → dibuang juga
+        db_aligned = db_aligned[periode_index(db_aligned).notna().to_numpy()]
+    current_aligned = safe_select(current_core, keep_cols)
+    db_aligned, current_aligned = compact_schema([db_aligned, current_aligned])
+
+    # REPLACE MODE: hindari duplikat periode yang sama di DB
+    if {"Tahun","nbulan"}.issubset(current_aligned.columns) and {"Tahun","nbulan"}.issubset(db_aligned.columns):
+        # Periode kosong (baris total / footer) → NaN → bukan periode bulan ini
+        periode_baru = set(periode_index(current_aligned).dropna())
+        db_clean = db_aligned[~periode_index(db_aligned).isin(periode_baru).to_numpy()]
+    else:
+        db_clean = db_aligned
+    return db_clean, current_aligned, keep_cols
+
+def finalize_result(result: pd.DataFrame, keep_cols: list, keep_unknown_daerah: bool = False) -> pd.DataFrame:
+    """Urutkan, bentuk key X dan pilih kolom output Data_Hasil.
+
+    `keep_unknown_daerah`: lihat apply_daerah_order (keep_unknown).
+    """
+    result = apply_daerah_order(result, keep_unknown=keep_unknown_daerah)
+    final_cols = [c for c in keep_cols + GROWTH_COLS if c in result.columns]
+    final = (
+        result[final_cols]
+        .sort_values(["Tahun","nbulan","Merk","Daerah"], na_position="last")
+        .reset_index(drop=True)
+    )
+
+    if set(X_PARTS).issubset(final.columns):
+        final["X"] = build_x_key(final)
+    return safe_select(final, DESIRED_COLS)
+
+# ==========================
+# ROLLUP CUBE
+# ==========================
+# Agregat siap-pakai: Total & MS per periode untuk tiap level wilayah
+# (Daerah / Pulau / Area AP / Nasional) x level entitas (Merk / Holding /
+# Produsen) x Kemasan (+ "Semua"). Data gabungan hanya di-scan sekali ke
+# grain terkecil; semua level diturunkan dari agregat itu.
+CUBE_WILAYAH  = ["Daerah","Pulau","Area AP"]
+CUBE_ENTITAS  = ["Merk","Holding","Produsen"]
+CUBE_NASIONAL = "Nasional"
+CUBE_SEMUA    = "Semua"
+CUBE_KEYS     = ["Level Wilayah","Wilayah","Level Entitas","Entitas","Kemasan"]
+CUBE_COLS     = CUBE_KEYS + ["Tahun","Bulan","nbulan","Total","MS",
+                             "MoM Growth %","YoY Growth %","YtD Growth %",
+                             "Total YtD","Total All YtD","MSY"]
+CUBE_TABLE    = "rollup_cube"
+
+def build_rollup_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Cube Total / MS / growth dari data gabungan (Database + bulan ini).
+
+    MS = Total / total pasar wilayah di periode itu (semua entitas & kemasan),
+    growth sama seperti calc_ms_and_growth tetapi per seri cube. Total YtD
+    dihitung per seri (Kemasan terpisah); total Merk ada di Kemasan "Semua".
+    """
+    wilayah = [c for c in CUBE_WILAYAH if c in df.columns]
+    entitas = [c for c in CUBE_ENTITAS if c in df.columns]
+    periode = ["Tahun","nbulan"]
+    base = (df.groupby(wilayah + entitas + ["Kemasan"] + periode, observed=True, dropna=False)["Total"]
+              .sum().reset_index())
+    base[CUBE_NASIONAL] = CUBE_NASIONAL
+    wilayah.append(CUBE_NASIONAL)
+
+    parts, pasar = [], []
+    for w in wilayah:
+        m = base.groupby([w] + periode, observed=True)["Total"].sum().reset_index(name="Total All")
+        pasar.append(m.rename(columns={w: "Wilayah"}).assign(**{"Level Wilayah": w}))
+        for e in entitas:
+            for kemasan in (["Kemasan"], []):
+                agg = base.groupby([w, e] + kemasan + periode, observed=True)["Total"].sum().reset_index()
+                agg = agg.rename(columns={w: "Wilayah", e: "Entitas"})
+                # Label cube selalu teks (Area AP / Merk bisa berupa angka di Excel)
+                agg = agg.astype({"Wilayah": str, "Entitas": str})
+                parts.append(agg.assign(**{"Level Wilayah": w, "Level Entitas": e,
+                                           "Kemasan": agg["Kemasan"].astype(str) if kemasan else CUBE_SEMUA}))
+    if not parts:
+        return pd.DataFrame(columns=CUBE_COLS)
+
+    cat = lambda d, cols: d.astype({c: "category" for c in cols})
+    cube = cat(pd.concat(parts, ignore_index=True), CUBE_KEYS)
+    pasar = cat(pd.concat([p.astype({"Wilayah": str}) for p in pasar], ignore_index=True),
+                ["Level Wilayah","Wilayah"])
+    pasar["Total All YtD"] = calendar_growth(pasar, "Total All", keys=["Level Wilayah","Wilayah"])["MS_YTD"]
+    # Kamus kategori sama dengan cube → merge per kode
+    for c in ["Level Wilayah","Wilayah"]:
+        pasar[c] = pasar[c].astype(cube[c].dtype)
+    cube = cube.merge(pasar, on=["Level Wilayah","Wilayah"] + periode, how="left")
+
+    cube["MS"] = cube["Total"] / cube["Total All"]
+    growth = calendar_growth(cube, "MS", keys=CUBE_KEYS)
+    for col in ["MoM Growth %","YoY Growth %","YtD Growth %"]:
+        cube[col] = growth[col].replace([float("inf"), float("-inf")], 1.0)
+    cube["Total YtD"] = calendar_growth(cube, "Total", keys=CUBE_KEYS)["MS_YTD"]
+    cube["MSY"] = cube["Total YtD"] / cube["Total All YtD"]
+    cube["Bulan"] = cube["nbulan"].astype(int).map(bulan_map)
+    return (cube.sort_values(CUBE_KEYS + periode, kind="mergesort")
+                .reset_index(drop=True)[CUBE_COLS])
+
+def cube_write(cube: pd.DataFrame, path: str = HISTORY_DB_PATH) -> int:
+    """Simpan cube ke SQLite (tabel CUBE_TABLE diganti penuh); return jumlah baris."""
+    data = cube[CUBE_COLS].astype(object)
+    data = data.where(data.notna(), None)
+    cols = ", ".join(_sql_name(c) for c in CUBE_COLS)
+    with closing(sqlite3.connect(path)) as con, con:
+        con.execute(f"DROP TABLE IF EXISTS {CUBE_TABLE}")
+        con.execute(f"CREATE TABLE {CUBE_TABLE} ({cols})")
+        con.execute(f"CREATE INDEX ix_{CUBE_TABLE}_level ON {CUBE_TABLE} "
+                    '("Level Wilayah", "Level Entitas", Tahun, nbulan)')
+        con.executemany(f"INSERT INTO {CUBE_TABLE} VALUES ({', '.join('?' * len(CUBE_COLS))})",
+                        data.itertuples(index=False, name=None))
+    return len(data)
+
+def cube_load(path: str = HISTORY_DB_PATH, **filters) -> pd.DataFrame:
+    """Ambil potongan cube, mis. cube_load(level_wilayah="Pulau", level_entitas="Holding", Tahun=2025).
+
+    Nama filter = nama kolom (spasi → "_", huruf kecil boleh); nilai list = IN.
+    """
+    by_name = {c.replace(" ", "_").lower(): c for c in CUBE_COLS}
+    where, params = [], []
+    for name, value in filters.items():
+        col = by_name.get(name.lower())
+        if col is None:
+            raise ValueError(f"Kolom cube tidak dikenal: {name}")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        where.append(f"{_sql_name(col)} IN ({', '.join('?' * len(values))})")
+        params += values
+    sql = f"SELECT * FROM {CUBE_TABLE}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with closing(sqlite3.connect(path)) as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+# ==========================
+# EXPLORER HASIL (filter & halaman)
+# ==========================
+# Index terbalik dibuat sekali per hasil: nilai → posisi baris (terurut).
+# Filter = gabungan posisi per kolom lalu irisan antar kolom; hanya baris
+# di halaman yang diambil dari frame, urutan hasil (finalize) tetap.
+EXPLORER_FILTERS = ["Tahun","Bulan","Daerah","Pulau","Merk","Kemasan"]
+
+def _python_value(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+def build_result_index(final: pd.DataFrame, columns: list = None) -> dict:
+    """{kolom: {nilai: array posisi baris}}; nilai urut kategori / urut naik."""
+    index = {}
+    for col in (columns or EXPLORER_FILTERS):
+        if col not in final.columns:
+            continue
+        s = final[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes, values = s.cat.codes.to_numpy(), s.cat.categories
+        else:
+            try:
+                codes, values = pd.factorize(s, sort=True)
+            except TypeError:   # campuran angka & teks
+                codes, values = pd.factorize(s)
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        n_na = len(codes) - int(counts.sum())
+        positions = np.split(order[n_na:], np.cumsum(counts)[:-1])
+        index[col] = {_python_value(v): pos for v, pos, n in zip(values, positions, counts) if n}
+    return index
+
+def filter_positions(index: dict, filters: dict):
+    """Posisi baris (terurut) yang lolos filter {kolom: [nilai]}; None = tanpa filter.
+
+    Kolom tanpa pilihan tidak difilter; irisan dimulai dari pilihan terkecil.
+    """
+    rows = None
+    selections = [(index[col], vals) for col, vals in filters.items() if vals and col in index]
+    for lookup, vals in sorted(selections, key=lambda x: sum(len(x[0].get(v, ())) for v in x[1])):
+        hit = [lookup[v] for v in vals if v in lookup]
+        sel = np.sort(np.concatenate(hit)) if hit else np.empty(0, dtype=np.intp)
+        rows = sel if rows is None else np.intersect1d(rows, sel, assume_unique=True)
+    return rows
+
+def result_page(final: pd.DataFrame, rows, page: int = 0, page_size: int = 100) -> pd.DataFrame:
+    """Halaman ke-`page` (mulai 0) dari hasil filter_positions."""
+    start = max(int(page), 0) * page_size
+    if rows is None:
+        return final.iloc[start:start + page_size]
+    return final.iloc[rows[start:start + page_size]]
+
+# ==========================
+# EXPORT Data_Hasil
+# ==========================
+RESULT_SHEET = "Result"
+EXPORT_FORMATS = {
+    "xlsx":    ("Data_Hasil.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv":     ("Data_Hasil.csv", "text/csv"),
+    "parquet": ("Data_Hasil.parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CHUNK_ROWS = 50_000
+
+def _excel_values(df: pd.DataFrame) -> list:
+    """Kolom sebagai list nilai Python; NaN / inf → None (sel kosong)."""
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_float_dtype(s):
+            a = s.to_numpy(dtype=float)
+            cols.append([None if not np.isfinite(v) else v for v in a.tolist()])
+        else:
+            cols.append(s.astype(object).where(s.notna(), None).tolist())
+    return cols
+
+def write_xlsx_streaming(df: pd.DataFrame, sheet_name: str = RESULT_SHEET) -> bytes:
+    """xlsx via openpyxl write_only: baris ditulis per chunk, tanpa model sel penuh."""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    bold = Font(bold=True)
+    header = []
+    for c in df.columns:
+        cell = WriteOnlyCell(ws, value=str(c))
+        cell.font = bold
+        header.append(cell)
+    ws.append(header)
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        for row in zip(*_excel_values(df.iloc[start:start + EXPORT_CHUNK_ROWS])):
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def export_result(final: pd.DataFrame, fmt: str = "xlsx") -> bytes:
+    """Render Data_Hasil ke bytes (xlsx / csv / parquet), urutan kolom tetap."""
+    if fmt == "xlsx":
+        return write_xlsx_streaming(final, RESULT_SHEET)
+    if fmt == "csv":
+        # BOM supaya Excel membaca UTF-8 dengan benar
+        return final.to_csv(index=False).encode("utf-8-sig")
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        final.to_parquet(buf, index=False)
+        return buf.getvalue()
+    raise ValueError(f"Format export tidak dikenal: {fmt} (pilih: {', '.join(EXPORT_FORMATS)})")
+
+# ==========================
+# KEY X & EXPORT DELTA
+# ==========================
+# X = Tahun+Bulan+Daerah+Merk+Kemasan. Teksnya dirakit per kombinasi unik
+# (periode & seri) lalu diambil lewat kode grup. Untuk delta, tiap baris
+# diringkas jadi hash 64-bit key (kolom X + Pulau/Produsen/Negara/Holding) +
+# digest (kolom nilai); snapshot (key, digest) hasil yang terakhir disimpan ada
+# di history store. Key tidak selalu unik (mis. Total beda untuk identitas yang
+# sama), jadi baris dicocokkan per pasangan (key, digest) termasuk jumlahnya.
+X_PARTS        = ["Tahun","Bulan","Daerah","Merk","Kemasan"]
+DIGEST_KEY_COLS = X_PARTS + ["Pulau","Produsen","Negara","Holding"]
+DIGEST_TABLE   = "result_digest"
+DIGEST_DIGITS  = 10   # digit signifikan angka sebelum di-hash (noise float / xlsx ≠ berubah)
+
+def _combo_text(df: pd.DataFrame, cols: list) -> tuple:
+    """(kode grup per baris, teks gabungan per grup) untuk kolom `cols`."""
+    codes = df.groupby(cols, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    _, first = np.unique(codes, return_index=True)
+    uniq = df[cols].iloc[first]
+    text = uniq[cols[0]].astype(str)
+    for c in cols[1:]:
+        text = text + uniq[c].astype(str)
+    return codes, text.array
+
+def build_x_key(df: pd.DataFrame) -> pd.Series:
+    """Kolom X (sama dengan konkatenasi string per baris), dari kode periode & seri."""
+    periode_codes, periode_text = _combo_text(df, X_PARTS[:2])
+    seri_codes, seri_text = _combo_text(df, X_PARTS[2:])
+    return (pd.Series(periode_text.take(periode_codes), index=df.index)
+            + pd.Series(seri_text.take(seri_codes), index=df.index))
+
+def _round_significant(a: np.ndarray, digits: int) -> np.ndarray:
+    """Bulatkan ke `digits` digit signifikan; nilai yang beda 1 ulp → bit yang sama.
+
+    NaN apa pun (mis. 0/0 dengan bit tanda) diganti satu np.nan kanonik.
+    """
+    a = np.asarray(a, dtype=float)
+    ok = np.isfinite(a) & (a != 0)
+    exp = np.floor(np.log10(np.abs(np.where(ok, a, 1.0))))
+    scale = 10.0 ** (digits - 1 - exp)
+    out = np.where(ok, np.round(a * scale) / scale, a) + 0.0   # -0.0 → 0.0
+    return np.where(np.isnan(out), np.nan, out)
+
+def _hash_rows(df: pd.DataFrame, cols: list) -> np.ndarray:
+    """Hash 64-bit per baris; kategori = teksnya, angka (int / float) → float64 dibulatkan.
+
+    Semua kolom angka disamakan ke float64: xlsx menulis float bulat sebagai
+    int, jadi hasil yang dibaca ulang bisa int64 untuk nilai yang sama.
+    """
+    parts = {}
+    for c in cols:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = pd.Series(_round_significant(s.to_numpy(dtype=float, na_value=np.nan), DIGEST_DIGITS),
+                          index=s.index)
+        parts[c] = s
+    return pd.util.hash_pandas_object(pd.DataFrame(parts), index=False).to_numpy()
+
+def result_digest(final: pd.DataFrame) -> pd.DataFrame:
+    """Snapshot ringkas hasil: key (hash kolom identitas) & digest (hash kolom nilai), int64."""
+    key_cols = [c for c in DIGEST_KEY_COLS if c in final.columns]
+    value_cols = [c for c in final.columns if c != "X" and c not in key_cols]
+    return pd.DataFrame({
+        "key":    _hash_rows(final, key_cols).view(np.int64),
+        "digest": _hash_rows(final, value_cols).view(np.int64),
+    })
+
+def _digest_pairs(digest: pd.DataFrame) -> pd.MultiIndex:
+    """(key, digest, ke-n) per baris: baris kembar tetap bisa dipasangkan satu-satu."""
+    n = digest.groupby(["key", "digest"], sort=False).cumcount()
+    return pd.MultiIndex.from_arrays([digest["key"].to_numpy(), digest["digest"].to_numpy(), n.to_numpy()])
+
+def result_delta(final: pd.DataFrame, previous: pd.DataFrame) -> tuple:
+    """Baris `final` yang baru / berubah dibanding snapshot `previous` (result_digest).
+
+    Baris yang hilang tidak ikut (loader cukup upsert). Return (delta, jumlah)
+    dengan jumlah = {"baru", "berubah", "sama"}.
+    """
+    cur = result_digest(final)
+    sama = _digest_pairs(cur).isin(_digest_pairs(previous))
+    baru = ~cur["key"].isin(previous["key"]).to_numpy()
+    berubah = ~sama & ~baru
+    counts = {"baru": int(baru.sum()), "berubah": int(berubah.sum()), "sama": int(sama.sum())}
+    return final[baru | berubah].reset_index(drop=True), counts
+
+def digest_write(digest: pd.DataFrame, path: str = HISTORY_DB_PATH) -> int:
+    """Upsert snapshot per key: semua baris key yang sama diganti, key lain tetap; return jumlah baris."""
+    with closing(sqlite3.connect(path)) as con, con:
+        info = con.execute(f"PRAGMA table_info({DIGEST_TABLE})").fetchall()
+        if any(col[1] == "key" and col[5] for col in info):
+            # Snapshot skema lama (key = X saja, PRIMARY KEY): key-nya tidak cocok lagi
+            con.execute(f"DROP TABLE {DIGEST_TABLE}")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {DIGEST_TABLE} (key INTEGER NOT NULL, digest INTEGER NOT NULL)")
+        con.execute(f"CREATE INDEX IF NOT EXISTS ix_{DIGEST_TABLE}_key ON {DIGEST_TABLE} (key)")
+        con.executemany(f"DELETE FROM {DIGEST_TABLE} WHERE key = ?",
+                        ((k,) for k in digest["key"].unique().tolist()))
+        con.executemany(f"INSERT INTO {DIGEST_TABLE} VALUES (?, ?)",
+                        zip(digest["key"].tolist(), digest["digest"].tolist()))
+    return len(digest)
+
+def digest_load(path: str = HISTORY_DB_PATH) -> pd.DataFrame:
+    """Snapshot dari history store; None bila belum pernah ditulis."""
+    if not os.path.exists(path):
+        return None
+    with closing(sqlite3.connect(path)) as con:
+        exists = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                             (DIGEST_TABLE,)).fetchone()
+        if not exists:
+            return None
+        return pd.read_sql_query(f"SELECT key, digest FROM {DIGEST_TABLE}", con)
+
+def read_result(data: bytes, fmt: str) -> pd.DataFrame:
+    """Baca Data_Hasil hasil export_result (xlsx / csv / parquet)."""
+    if fmt == "xlsx":
+        return pd.read_excel(io.BytesIO(data), sheet_name=RESULT_SHEET, engine="openpyxl")
+    if fmt == "csv":
+        return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig", float_precision="round_trip")
+    if fmt == "parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    raise ValueError(f"Format hasil tidak dikenal: {fmt} (pilih: {', '.join(EXPORT_FORMATS)})")
+
+# ==========================
+# CACHE HASIL (disk)
+# ==========================
+# Satu entri = folder <cache>/<key>: final.pkl + file download + meta.json.
+# Key = hash isi input + periode + opsi yang memengaruhi hasil; entri tidak
+# pernah diubah. LRU berdasarkan mtime folder (disentuh saat hit), dibatasi
+# RESULT_CACHE_MAX_MB. Naikkan RESULT_CACHE_VERSION bila format hasil berubah.
+RESULT_CACHE_DIR     = os.environ.get("MS_RESULT_CACHE", ".result_cache")
+RESULT_CACHE_MAX_MB  = float(os.environ.get("MS_RESULT_CACHE_MB", "500"))
+RESULT_CACHE_VERSION = 1
+
+def result_cache_key(**parts) -> str:
+    """Key cache dari hash file input, periode & opsi (urutan argumen bebas)."""
+    parts["_version"] = RESULT_CACHE_VERSION
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def store_fingerprint(path: str = HISTORY_DB_PATH) -> str:
+    """Sidik history store (ukuran + mtime file) untuk key cache."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return "kosong"
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+def result_cache_get(key: str, cache_dir: str = RESULT_CACHE_DIR) -> dict:
+    """Hasil tersimpan {final, messages, downloads} atau None bila tidak ada / rusak."""
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        return None
+    try:
+        with open(os.path.join(entry, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        final = pd.read_pickle(os.path.join(entry, "final.pkl"))
+        downloads = []
+        for label, file_name, mime in meta["downloads"]:
+            with open(os.path.join(entry, file_name), "rb") as f:
+                downloads.append((label, f.read(), file_name, mime))
+        messages = meta["messages"]
+    except Exception:
+        # Rusak / ditulis versi pandas lain (AttributeError, ImportError, ...) → miss
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    os.utime(entry)   # LRU: entri terakhir dipakai
+    return {"final": final, "messages": messages, "downloads": downloads}
+
+def result_cache_put(key: str, final: pd.DataFrame, messages: list, downloads: list,
+                     cache_dir: str = RESULT_CACHE_DIR, max_mb: float = RESULT_CACHE_MAX_MB) -> bool:
+    """Simpan hasil (atomik: tulis ke folder sementara lalu rename); lalu evict LRU."""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, key)
+    if os.path.isdir(entry):
+        return False
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+    try:
+        final.to_pickle(os.path.join(tmp, "final.pkl"))
+        for _, data, file_name, _ in downloads:
+            with open(os.path.join(tmp, file_name), "wb") as f:
+                f.write(data)
+        meta = {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "messages": messages,
+                "downloads": [(label, file_name, mime) for label, _, file_name, mime in downloads]}
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # Job lain sudah menyimpan key yang sama / disk bermasalah
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    result_cache_evict(cache_dir, max_mb)
+    return True
+
+def _cache_entries(cache_dir: str) -> list:
+    """[(mtime, bytes, path)] entri cache (folder sementara dilewati)."""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+        entries.append((os.stat(path).st_mtime, size, path))
+    return entries
+
+def result_cache_evict(cache_dir: str = RESULT_CACHE_DIR, max_mb: float = RESULT_CACHE_MAX_MB) -> int:
+    """Hapus entri paling lama tidak dipakai sampai total <= max_mb; return jumlah dihapus."""
+    entries = sorted(_cache_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_mb * 1e6:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+def result_cache_clear(cache_dir: str = RESULT_CACHE_DIR) -> int:
+    """Invalidasi: hapus semua entri cache; return jumlah dihapus."""
+    entries = _cache_entries(cache_dir)
+    for _, _, path in entries:
+        shutil.rmtree(path, ignore_errors=True)
+    return len(entries)
+
+def result_cache_stats(cache_dir: str = RESULT_CACHE_DIR) -> tuple:
+    """(jumlah entri, total MB)."""
+    entries = _cache_entries(cache_dir)
+    return len(entries), sum(size for _, size, _ in entries) / 1e6
+
+# ======================================
+# INSTRUMENTASI (waktu & memori per tahap)
+# ======================================
+# Satu run = satu baris JSON di PERF_LOG_PATH (JSON Lines), agar performa
+# antar bulan bisa dibandingkan. Memori = puncak alokasi Python di atas
+# pemakaian awal tahap (tracemalloc) — opsional karena memperlambat openpyxl.
+PERF_LOG_PATH = os.environ.get("MS_PERF_LOG", "perf_log.jsonl")
+_PERF_LOG_LOCK = threading.Lock()   # beberapa job bisa menulis bersamaan
+# tracemalloc berlaku untuk seluruh proses: hanya satu tahap sekaligus yang
+# mengukur memori (agar reset_peak / stop milik satu job tidak merusak angka job
+# lain). Tahap yang bersamaan tidak menunggu, peak_mb-nya kosong (None).
+# Alokasi thread lain selama pengukuran tetap ikut terhitung.
+_TRACE_LOCK = threading.Lock()
+
+class StageLog:
+    """Pencatat waktu, jumlah baris & puncak memori tiap tahap bernama.
+
+    `on_stage(nama)` dipanggil di awal tiap tahap (progres / pembatalan job).
+    """
+
+    def __init__(self, memory: bool = False, on_stage=None):
+        self.memory = memory
+        self.on_stage = on_stage
+        self.stages = []
+        self.started = datetime.datetime.now()
+
+    @contextmanager
+    def stage(self, name: str):
+        """`with log.stage("calc") as rec: ...; rec["rows"] = len(df)`"""
+        if self.on_stage is not None:
+            self.on_stage(name)
+        rec = {"stage": name, "seconds": None, "rows": None, "peak_mb": None}
+        # Tidak pernah menunggu: bila tahap lain sedang diukur, peak_mb = None
+        traced = self.memory and _TRACE_LOCK.acquire(blocking=False)
+        try:
+            own_trace = traced and not tracemalloc.is_tracing()
+            if own_trace:
+                tracemalloc.start()
+            elif traced:
+                tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0] if traced else 0
+            t0 = time.perf_counter()
+            try:
+                yield rec
+            finally:
+                rec["seconds"] = round(time.perf_counter() - t0, 4)
+                if traced:
+                    rec["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - base) / 1e6, 2)
+                if own_trace:
+                    tracemalloc.stop()
+                self.stages.append(rec)
+        finally:
+            if traced:
+                _TRACE_LOCK.release()
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.stages, columns=["stage", "seconds", "rows", "peak_mb"])
+
+    def total_seconds(self) -> float:
+        return round(sum(r["seconds"] for r in self.stages), 4)
+
+    def write_json(self, path: str = PERF_LOG_PATH, **params) -> dict:
+        """Tambahkan satu record run (parameter + tahap) ke file JSON Lines."""
+        record = {
+            "timestamp": self.started.isoformat(timespec="seconds"),
+            "total_seconds": self.total_seconds(),
+            "params": params,
+            "stages": self.stages,
+        }
+        with _PERF_LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+        return record
@@ -0,0 +1,135 @@
+"""Antrian job latar belakang untuk Start Proses.
+
+Satu JobQueue (thread pool) dipakai bersama oleh semua sesi Streamlit:
+skrip UI hanya mengirim job lalu memantau progresnya, sehingga beberapa
+user bisa memproses bersamaan tanpa sesi yang membeku. Progres &
+pembatalan bersifat kooperatif — dicek di batas tiap tahap StageLog.
+"""
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import StageLog
+
+JOB_QUEUED    = "antri"
+JOB_RUNNING   = "berjalan"
+JOB_DONE      = "selesai"
+JOB_FAILED    = "gagal"
+JOB_CANCELLED = "dibatalkan"
+JOB_KEEP      = 32   # job selesai yang disimpan (hasil belum diambil)
+
+class JobCancelled(Exception):
+    """Job dihentikan atas permintaan user."""
+
+class Job:
+    """Satu proses di antrian: status, tahap berjalan, progres & hasil."""
+
+    def __init__(self, job_id: int, label: str, n_stages: int, memory: bool = False):
+        self.id = job_id
+        self.label = label
+        self.n_stages = max(int(n_stages), 1)
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+        self.perf = StageLog(memory=memory, on_stage=self._on_stage)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    @property
+    def progress(self) -> float:
+        """0..1 dari jumlah tahap yang sudah dimulai."""
+        if self.status == JOB_DONE:
+            return 1.0
+        return min(len(self.perf.stages) / self.n_stages, 0.99)
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self):
+        """Minta berhenti; job yang belum mulai langsung dibatalkan."""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = JOB_CANCELLED
+            self.finished = time.time()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} dibatalkan.")
+
+    def _on_stage(self, name: str):
+        self.check_cancelled()
+        self.stage = name
+
+class JobQueue:
+    """Thread pool + daftar job; aman dipakai dari banyak sesi sekaligus."""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ms-job")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label: str = "", n_stages: int = 1, memory: bool = False, **kwargs) -> Job:
+        """Jalankan fn(job, *args, **kwargs) di worker; return Job."""
+        with self._lock:
+            job = Job(next(self._ids), label, n_stages, memory=memory)
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = JOB_RUNNING
+        job.started = time.time()
+        try:
+            job.check_cancelled()
+            job.result = fn(job, *args, **kwargs)
+            job.status = JOB_DONE
+        except JobCancelled:
+            job.status = JOB_CANCELLED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.traceback = traceback.format_exc()
+            job.status = JOB_FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id: int) -> Job:
+        return self._jobs.get(job_id)
+
+    def pop(self, job_id: int) -> Job:
+        """Ambil & lepas job yang sudah selesai (hasilnya tidak ditahan lagi)."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def counts(self) -> dict:
+        """Jumlah job per status."""
+        out = {}
+        for job in list(self._jobs.values()):
+            out[job.status] = out.get(job.status, 0) + 1
+        return out
+
+    def _prune(self):
+        """Buang job selesai tertua bila lebih dari JOB_KEEP (hasil yang tak diambil)."""
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in sorted(finished, key=lambda j: j.finished or 0)[:-JOB_KEEP or None]:
+            del self._jobs[job.id]
+
+    def shutdown(self, wait: bool = True):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._pool.shutdown(wait=wait)
@@ -1,232 +1,204 @@
 # streamlit_app.py
 import streamlit as st
 import pandas as pd
-import numpy as np
-import re
 import io
-from pandas.api.types import CategoricalDtype
-
-# =========================
-# KONFIGURASI HEADER & DATA
-# =========================
-# (index pandas 0-based; Excel rows: 6,7,52,53,8)
-ROW_PRODUSEN   = 6  - 1   # row 6 -> index 5
-ROW_KEMASAN    = 7  - 1   # row 7 -> index 6
-ROW_MERK       = 52 - 1   # row 52 -> index 51
-ROW_HOLDING    = 53 - 1   # row 53 -> index 52
-ROW_DATA_START = 8  - 1   # row 8 -> index 7
-
-BASE_COLS = [
-    "Tahun","Bulan","nbulan","Daerah","Pulau","Produsen",
-    "Total","Kemasan","Negara","Holding","Merk"
-]
-
-# Mapping pulau & nama bulan
-daerah_to_pulau = {
-    "D.I. Aceh":"Sumatera","Sumut":"Sumatera","Sumbar":"Sumatera","Riau":"Sumatera",
-    "Kepulauan Riau":"Sumatera","Jambi":"Sumatera","Sumsel":"Sumatera",
-    "Bangka - Belitung":"Sumatera","Bengkulu":"Sumatera","Lampung":"Sumatera",
-    "D. K. I. Jakarta":"Jawa","Banten":"Jawa","Jabar":"Jawa","Jateng":"Jawa","D. I. Y.":"Jawa","Jatim":"Jawa",
-    "Kalbar":"Kalimantan","Kalsel":"Kalimantan","Kalteng":"Kalimantan","Kaltim":"Kalimantan","Kaltara":"Kalimantan",
-    "Sultera":"Sulawesi","Sulsel":"Sulawesi","Sulbar":"Sulawesi","Sulteng":"Sulawesi","Sulut":"Sulawesi","Gorontalo":"Sulawesi",
-    "Bali":"Bali Nusra","N. T. B.":"Bali Nusra","N. T. T.":"Bali Nusra",
-    "Maluku":"Ind. Timur","Maluku Utara":"Ind. Timur","Papua Barat":"Ind. Timur","Papua":"Ind. Timur"
-}
-bulan_map = {1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"Mei",6:"Jun",7:"Jul",8:"Agt",9:"Sep",10:"Okt",11:"Nov",12:"Des"}
-
-# ==========================
-# URUTAN KUSTOM: DAEARAH
-# ==========================
-DAERAH_ORDER = [
-    "D.I. Aceh","Sumut","Sumbar","Riau","Kepulauan Riau","Jambi","Sumsel","Bangka - Belitung","Bengkulu","Lampung",
-    "D. K. I. Jakarta","Banten","Jabar","Jateng","D. I. Y.","Jatim",
-    "Kalbar","Kalsel","Kalteng","Kaltim","Kaltara",
-    "Sultera","Sulsel","Sulbar","Sulteng","Sulut","Gorontalo",
-    "Bali","N. T. B.","N. T. T.",
-    "Maluku","Maluku Utara","Papua Barat","Papua"
-]
-
-def apply_daerah_order(df: pd.DataFrame) -> pd.DataFrame:
-    """Set kolom Daerah sebagai kategori berurutan sesuai DAERAH_ORDER."""
-    if "Daerah" in df.columns:
-        cat = CategoricalDtype(categories=DAERAH_ORDER, ordered=True)
-        df["Daerah"] = df["Daerah"].astype(str).str.strip().astype(cat)
-    return df
-
-# ==========
-# UTILITIES
-# ==========
-def header_text(df: pd.DataFrame, r: int, c: int) -> str:
-    """Ambil isi sel dari grid mentah, aman terhadap NaN & Out of Range."""
-    try:
-        v = df.iat[r, c]
-    except Exception:
-        return ""
-    return "" if pd.isna(v) else str(v)
-
-def clean_text(s: str) -> str:
-    return str(s).strip()
-
-def clean_kemasan(s: str) -> str:
-    s = clean_text(s)
-    if s.lower() in ["curah", "bulk"]:
-        return "Bulk"
-    if s.lower() in ["bag", "zak"]:
-        return "Bag"
-    return s
-
-# ✅ FIXED: parsing angka
-def to_number(v) -> float:
-    if pd.isna(v): 
-        return 0.0
-    s = str(v).strip()
-    if s in ("", "-"): 
-        return 0.0
-
-    # --- Normalisasi angka ---
-    # Format Eropa: 1.234,56 → 1234.56
-    if re.match(r"^\d{1,3}(\.\d{3})+,\d+$", s):
-        s = s.replace(".", "").replace(",", ".")
-    # Format Internasional: 1,234.56 → 1234.56
-    elif re.match(r"^\d{1,3}(,\d{3})+\.\d+$", s):
-        s = s.replace(",", "")
-    # Desimal dengan koma: 1067,367 → 1067.367
-    elif re.match(r"^\d+,\d+$", s):
-        s = s.replace(",", ".")
-    # Angka biasa (1067.367 atau 1067) → langsung
-    else:
-        s = s
+import os
+
+from engine import (
+    HISTORY_DB_PATH, apply_daerah_order, read_database_xlsx, unpivot_produsen_holding_merk, unpivot_sheets, file_hash,
+    calc_ms_and_growth, calc_ms_and_growth_incremental, incremental_window_start,
+    history_load, history_periods, history_write,
+    prepare_current, compile_mapping, apply_mapping, align_with_history, compact_schema, finalize_result,
+    EXPORT_FORMATS, export_result, to_numeric_series, StageLog, PERF_LOG_PATH,
+    build_rollup_cube, cube_write,
+    EXPLORER_FILTERS, build_result_index, filter_positions, result_page,
+    RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB, result_cache_key, store_fingerprint,
+    result_cache_get, result_cache_put, result_cache_clear, result_cache_stats,
+    result_digest, result_delta, digest_write, digest_load, read_result,
+)
+from jobs import JobQueue, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+
+# ================================
+# CACHE (antar rerun Streamlit)
+# ================================
+# Kunci cache = hash isi file (+ nama sheet); argumen bertanda "_" tidak
+# di-hash ulang oleh Streamlit. Jumlah entri dibatasi (LRU).
+CACHE_MAX_ENTRIES = 16
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_sheet_names(key: str, _xlsx_bytes: bytes) -> list:
+    return pd.ExcelFile(io.BytesIO(_xlsx_bytes), engine="openpyxl").sheet_names
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_unpivot(key: str, sheet_name, _xlsx_bytes: bytes) -> pd.DataFrame:
+    return apply_daerah_order(unpivot_produsen_holding_merk(_xlsx_bytes, sheet_name=sheet_name))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_unpivot_sheets(key: str, sheet_names: tuple, _xlsx_bytes: bytes) -> pd.DataFrame:
+    """Beberapa sheet sekaligus (paralel), tiap baris bertanda Sheet."""
+    return apply_daerah_order(unpivot_sheets(_xlsx_bytes, list(sheet_names)))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_read_excel(key: str, _xlsx_bytes: bytes) -> pd.DataFrame:
+    """Mapping (sheet pertama, header baris 1)."""
+    return pd.read_excel(io.BytesIO(_xlsx_bytes), engine="openpyxl")
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_read_database(key: str, since, exclude, _xlsx_bytes: bytes) -> pd.DataFrame:
+    """Database (streaming): kolom history saja, periode di luar jendela dilewati."""
+    return read_database_xlsx(_xlsx_bytes, since=since, exclude=exclude)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_mapping_index(key: str, _xlsx_bytes: bytes) -> dict:
+    """Index lookup Mapping (Segment & Area AP), dibuat sekali per file Mapping."""
+    return compile_mapping(cached_read_excel(key, _xlsx_bytes))
 
+# ======================
+# PROSES (job latar belakang)
+# ======================
+# Start Proses dijalankan di JobQueue bersama (lihat jobs.py). Fungsi job tidak
+# memanggil elemen UI st.* (pesan & file dikembalikan sebagai hasil); yang
+# dipanggil hanya cache st.cache_data di atas (cached_read_database,
+# cached_mapping_index), yang aman dipakai dari thread worker.
+JOB_WORKERS = int(os.environ.get("MS_JOB_WORKERS", "2"))
+
+@st.cache_resource
+def job_queue() -> JobQueue:
+    """Satu antrian untuk semua sesi."""
+    return JobQueue(max_workers=JOB_WORKERS)
+
+def count_stages(opts: dict) -> int:
+    """Perkiraan jumlah tahap (untuk progress bar)."""
+    n = len(opts["pre_stages"]) + 9 + bool(opts["cache_key"])
+    n += bool(opts["remap_history"]) + bool(opts["save_history"]) + bool(opts["export_delta"])
+    n += bool(opts["save_history"]) and not opts["float32"]
+    if opts["build_cube"]:
+        n += 2 + bool(opts["save_history"])
+    return n
+
+def start_process(job, opts: dict) -> dict:
+    """Pipeline Start Proses; return hasil, pesan & file download."""
+    perf = job.perf
+    perf.stages.extend(opts["pre_stages"])
+    tahun, nbulan = opts["tahun"], opts["nbulan"]
+    messages, downloads = [], []
     try:
-        return float(s)
-    except Exception:
-        return 0.0
-
-def stop_at_this_column(df: pd.DataFrame, col: int) -> bool:
-    v = header_text(df, ROW_DATA_START, col)
-    return (v.strip() == "" or v.strip() == "-")
-
-def find_col_provinsi(df: pd.DataFrame, max_col: int):
-    for c in range(0, max_col+1):
-        t6  = header_text(df, ROW_PRODUSEN, c).replace(" ", "").upper()
-        t7  = header_text(df, ROW_KEMASAN,  c).replace(" ", "").upper()
-        t52 = header_text(df, ROW_MERK,     c).replace(" ", "").upper()
-        if "PROVINSI" in t6 or "PROVINSI" in t7 or "PROVINSI" in t52:
-            return c
-    return None
-
-# ✅ FIXED: gunakan to_number per elemen
-def to_numeric_series(s: pd.Series) -> pd.Series:
-    return s.apply(to_number)
-
-def safe_select(df: pd.DataFrame, cols: list) -> pd.DataFrame:
-    return df[[c for c in cols if c in df.columns]].copy()
-
-# ==============================
-# UNPIVOT: PRODUSEN-HOLDING-MERK
-# ==============================
-def unpivot_produsen_holding_merk(xlsx_bytes: bytes, sheet_name=0) -> pd.DataFrame:
-    df = pd.read_excel(io.BytesIO(xlsx_bytes), sheet_name=sheet_name, header=None, engine="openpyxl", dtype=str)
-    if df.shape[1] == 0:
-        raise ValueError("Sheet kosong.")
-
-    max_col = int(df.iloc[ROW_KEMASAN].last_valid_index()) if df.shape[1] else -1
-    if max_col < 0:
-        raise ValueError("Baris kemasan (row 7) kosong / tidak ditemukan.")
-
-    col_prov = find_col_provinsi(df, max_col)
-    if col_prov is None:
-        raise ValueError("Kolom 'Provinsi' tidak ditemukan di row 6/7/52.")
-
-    first_data_col = col_prov + 1
-
-    produsen_order = []
-    for c in range(first_data_col, max_col + 1):
-        if stop_at_this_column(df, c):
-            break
-        produsen = clean_text(header_text(df, ROW_PRODUSEN, c))
-        kemasan  = clean_kemasan(header_text(df, ROW_KEMASAN,  c))
-        if produsen and kemasan in ("Bag", "Bulk"):
-            if produsen not in produsen_order:
-                produsen_order.append(produsen)
-    produsen_to_idx = {p: i+1 for i, p in enumerate(produsen_order)}
-
-    records = []
-    for pass_type in ("Bag", "Bulk"):
-        blank_run = 0
-        r = ROW_DATA_START
-        max_row = df.shape[0] - 1
-        while r <= max_row:
-            daerah = clean_text(header_text(df, r, col_prov))
-            if daerah.upper().startswith("CATATAN"):
-                break
-            if daerah == "":
-                blank_run += 1
-                if blank_run >= 2:
-                    break
-                r += 1
-                continue
+        with perf.stage("read_database") as rec:
+            # Periode bulan ini akan di-overwrite → tidak perlu dibaca. Inkremental
+            # cukup jendela history, kecuali Database Excel diimpor penuh ke store,
+            # Mapping diterapkan ulang ke seluruh history, atau rollup cube dibangun
+            # (cube mencakup seluruh history).
+            since = None
+            if (opts["incremental"] and not opts["verify"] and not opts["build_cube"]
+                    and not opts["remap_history"] and (opts["use_store"] or not opts["save_history"])):
+                since = incremental_window_start(tahun, nbulan)
+            if opts["use_store"]:
+                db = history_load(since=since, exclude=(tahun, nbulan))
+            else:
+                db = cached_read_database(file_hash(opts["db_bytes"]), since, (tahun, nbulan), opts["db_bytes"])
+            rec["rows"] = len(db)
+        with perf.stage("mapping_index") as rec:
+            mapping_index = cached_mapping_index(file_hash(opts["map_bytes"]), opts["map_bytes"])
+            rec["rows"] = sum(len(values) for *_, values in mapping_index.values())
+        with perf.stage("to_numeric") as rec:
+            if "Total" in db.columns:
+                db = db.assign(Total=to_numeric_series(db["Total"]))
+            rec["rows"] = len(db)
+
+        with perf.stage("prepare_mapping") as rec:
+            current_core = prepare_current(opts["df_long"], tahun, nbulan)
+            current_core = apply_mapping(current_core, mapping_index)
+            rec["rows"] = len(current_core)
+        if opts["remap_history"]:
+            with perf.stage("remap_history") as rec:
+                db = apply_mapping(db, mapping_index)
+                rec["rows"] = len(db)
+        with perf.stage("align_history") as rec:
+            db_clean, current_aligned, keep_cols = align_with_history(db, current_core)
+            rec["rows"] = len(db_clean) + len(current_aligned)
+
+        if opts["save_history"]:
+            with perf.stage("history_write") as rec:
+                # Store: cukup partisi bulan ini (+ partisi yang di-remap);
+                # dari Excel: seluruh isi Database ikut diimpor
+                if opts["use_store"] and not opts["remap_history"]:
+                    to_save = current_aligned
+                else:
+                    to_save = pd.concat([db_clean, current_aligned], ignore_index=True)
+                rec["rows"] = n_saved = history_write(to_save)
+            messages.append(f"History store diperbarui • {n_saved:,} baris")
+        if opts["build_cube"]:
+            # Sebelum cast float32: cube di store tetap presisi penuh
+            with perf.stage("rollup_cube") as rec:
+                cube = build_rollup_cube(pd.concat([db_clean, current_aligned], ignore_index=True))
+                rec["rows"] = len(cube)
+        if opts["float32"]:
+            # Setelah history ditulis: store tetap presisi penuh
+            db_clean, current_aligned = compact_schema([db_clean, current_aligned], float32=True)
+        with perf.stage("calc_ms_growth") as rec:
+            if opts["incremental"]:
+                result = calc_ms_and_growth_incremental(db_clean, current_aligned, verify=opts["verify"])
             else:
-                blank_run = 0
-            if daerah.upper().startswith("TOTAL"):
-                r += 1
-                continue
-            for c in range(first_data_col, max_col + 1):
-                if stop_at_this_column(df, c):
-                    break
-                merk    = clean_text(header_text(df, ROW_MERK,     c))
-                prod    = clean_text(header_text(df, ROW_PRODUSEN,  c))
-                holding = clean_text(header_text(df, ROW_HOLDING,   c))
-                kemasan = clean_kemasan(header_text(df, ROW_KEMASAN, c))
-                if prod and kemasan in ("Bag", "Bulk") and kemasan == pass_type:
-                    val = to_number(header_text(df, r, c))
-                    type_rank = 0 if pass_type == "Bag" else 100
-                    if prod in produsen_to_idx:
-                        order_key = type_rank + produsen_to_idx[prod]
-                        records.append({
-                            "Daerah": daerah,
-                            "Kemasan": kemasan,
-                            "Produsen": prod,
-                            "Holding": holding,
-                            "Merk": merk,
-                            "Total": val,
-                            "OrderKey": order_key
-                        })
-            r += 1
-
-    out = pd.DataFrame.from_records(records)
-    if not out.empty:
-        out = out.sort_values(["Daerah", "OrderKey"], kind="mergesort").reset_index(drop=True)
-    return out
-
-# ========================
-# HITUNG MS & PERTUMBUHAN
-# ========================
-def calc_ms_and_growth(df: pd.DataFrame) -> pd.DataFrame:
-    df = (df.groupby(BASE_COLS, as_index=False)["Total"].sum()
-            .sort_values(["Tahun","nbulan","Daerah","Merk"]))
-    total_per_period = df.groupby(["Tahun","Bulan","Daerah"])["Total"].transform("sum")
-    df["MS"] = df["Total"] / total_per_period
-
-    df = df.sort_values(["Merk","Daerah","Kemasan","Tahun","nbulan"]).copy()
-    df["MoM Growth %"] = df.groupby(["Merk","Daerah","Kemasan"])["MS"].pct_change(1)
-    df["YoY Growth %"] = df.groupby(["Merk","Daerah","Kemasan"])["MS"].pct_change(12)
-
-    df["MS_YTD"] = df.groupby(["Merk","Daerah","Kemasan","Tahun"])["MS"].cumsum()
-    df["YtD Growth %"] = df.groupby(["Merk","Daerah","Kemasan"])["MS_YTD"].pct_change(12)
-
-    df = df.sort_values(["Daerah","Merk","Tahun","nbulan"]).copy()
-    df["Total Merk YtD"] = df.groupby(["Daerah","Merk","Tahun"])["Total"].cumsum()
-    total_all = (
-        df.groupby(["Daerah","Tahun","nbulan"])["Total"].sum()
-          .groupby(level=["Daerah","Tahun"]).cumsum().reset_index(name="Total All YtD")
-    )
-    df = df.merge(total_all, on=["Daerah","Tahun","nbulan"], how="left")
-    df["MSY"] = df["Total Merk YtD"] / df["Total All YtD"]
-
-    for col in ["MoM Growth %","YoY Growth %","YtD Growth %"]:
-        df[col] = df[col].replace([float("inf"), float("-inf")], 1.0)
-    return df
+                result = calc_ms_and_growth(pd.concat([db_clean, current_aligned], ignore_index=True))
+            rec["rows"] = len(result)
+        with perf.stage("finalize") as rec:
+            final = finalize_result(result, keep_cols)
+            rec["rows"] = len(final)
+        with perf.stage("result_index") as rec:
+            result_index = build_result_index(final)
+            rec["rows"] = len(final)
+        messages.append(f"Selesai! Baris hasil: {len(final):,}")
+
+        fmt = opts["export_fmt"]
+        file_name, mime = EXPORT_FORMATS[fmt]
+        export_frame = final
+        if opts["export_delta"]:
+            with perf.stage("delta") as rec:
+                # Pembanding: Data Hasil yang di-upload, selain itu snapshot di history store
+                if opts["prev_bytes"] is not None:
+                    previous = result_digest(read_result(opts["prev_bytes"], opts["prev_fmt"]))
+                else:
+                    previous = digest_load()
+                if previous is None:
+                    messages.append("Delta: belum ada hasil sebelumnya → semua baris diexport.")
+                else:
+                    export_frame, counts = result_delta(final, previous)
+                    messages.append(f"Delta • baru: {counts['baru']:,} • berubah: {counts['berubah']:,} "
+                                    f"• sama (dilewati): {counts['sama']:,}")
+                file_name = "Data_Hasil_Delta" + os.path.splitext(file_name)[1]
+                rec["rows"] = len(export_frame)
+        if opts["save_history"] and not opts["float32"]:
+            with perf.stage("digest_write") as rec:
+                # Snapshot untuk delta berikutnya (upsert per key X); hasil float32
+                # tidak disimpan karena tidak akan cocok dengan run presisi penuh
+                rec["rows"] = digest_write(result_digest(final))
+        with perf.stage(f"export_{fmt}") as rec:
+            downloads.append((f"Download {file_name}", export_result(export_frame, fmt), file_name, mime))
+            rec["rows"] = len(export_frame)
+
+        if opts["build_cube"]:
+            if opts["save_history"]:
+                with perf.stage("cube_write") as rec:
+                    rec["rows"] = cube_write(cube)
+            cube_name = "Rollup_Cube" + os.path.splitext(file_name)[1]
+            messages.append(f"Rollup cube • Baris: {len(cube):,}"
+                            + (" • tersimpan di history store" if opts["save_history"] else ""))
+            with perf.stage(f"export_cube_{fmt}") as rec:
+                downloads.append((f"Download {cube_name}", export_result(cube, fmt), cube_name, mime))
+                rec["rows"] = len(cube)
+
+        if opts["cache_key"]:
+            with perf.stage("result_cache_put") as rec:
+                result_cache_put(opts["cache_key"], final, messages, downloads)
+                rec["rows"] = len(final)
+    finally:
+        try:
+            perf.write_json(**opts["log_params"])
+            log = f"Log JSON → {PERF_LOG_PATH}"
+        except OSError as e:
+            log = f"Log JSON gagal ditulis: {e}"
+    return {"final": final, "result_index": result_index,
+            "messages": messages, "downloads": downloads, "log": log}
 
 # ======================
 # STREAMLIT: APP LAYOUT
@@ -238,10 +210,39 @@ with st.expander("Set Periode Data Bulan Ini", expanded=True):
     tahun_input = st.number_input("Tahun", min_value=2000, max_value=2100, step=1, value=2025)
     bulan_input = st.selectbox("Bulan (1–12)", list(range(1, 13)))
 
+db_source = st.radio("Sumber Database", ["Upload Excel", "History store"], horizontal=True)
+use_store = db_source == "History store"
+
 uploaded_current = st.file_uploader("Upload Data Bulan Ini (Excel)", type=["xlsx"])
-uploaded_db      = st.file_uploader("Upload Database (Excel)", type=["xlsx"])
+uploaded_db      = None if use_store else st.file_uploader("Upload Database (Excel)", type=["xlsx"])
 uploaded_map     = st.file_uploader("Upload Mapping (Excel)", type=["xlsx"])
 
+if use_store:
+    periods = history_periods() if os.path.exists(HISTORY_DB_PATH) else pd.DataFrame()
+    store_ready = not periods.empty
+    if store_ready:
+        first, last = periods.iloc[0], periods.iloc[-1]
+        st.caption(f"History store: {len(periods)} periode "
+                   f"({int(first.Tahun)}-{int(first.nbulan):02d} s/d {int(last.Tahun)}-{int(last.nbulan):02d}), "
+                   f"{int(periods['Baris'].sum()):,} baris • {HISTORY_DB_PATH}")
+    else:
+        st.warning("History store kosong. Proses sekali dengan Upload Excel + 'Simpan ke history store'.")
+    db_ready = store_ready
+else:
+    db_ready = uploaded_db is not None
+save_history = st.checkbox("Simpan ke history store", value=use_store)
+remap_history = st.checkbox("Terapkan ulang Mapping ke history (Segment & Area AP)", value=False,
+                            help="Untuk Mapping yang berubah; data mentah tidak perlu diproses ulang.")
+
+calc_mode = st.radio("Mode hitung", ["Full history", "Inkremental (bulan ini saja)"], horizontal=True)
+incremental = calc_mode != "Full history"
+verify_incremental = incremental and st.checkbox("Verifikasi vs full recompute", value=False)
+use_float32 = st.checkbox("Hitung dalam float32 (hemat memori, presisi ~7 digit)", value=False)
+profile_memory = st.checkbox("Ukur memori per tahap (tracemalloc, lebih lambat)", value=False,
+                             help="Satu tahap diukur sekaligus untuk semua sesi; tahap yang bersamaan "
+                                  "tidak punya angka memori.")
+perf = StageLog(memory=profile_memory)
+
 def get_bytes(uploaded_file) -> bytes:
     return uploaded_file.getvalue() if uploaded_file is not None else None
 
@@ -249,109 +250,177 @@ df_long = None
 if uploaded_current is not None:
     try:
         cur_bytes = get_bytes(uploaded_current)
-        xls = pd.ExcelFile(io.BytesIO(cur_bytes), engine="openpyxl")
-        sheet_names = xls.sheet_names
-        sheet_sel = st.selectbox("Pilih Sheet • Data Bulan Ini", sheet_names, index=0)
-        df_long = unpivot_produsen_holding_merk(cur_bytes, sheet_name=sheet_sel)
-        df_long = apply_daerah_order(df_long)
-        st.success(f"Unpivot OK • Baris: {len(df_long):,}")
-        st.dataframe(
-            df_long.sort_values(["Daerah","OrderKey"], na_position="last").head(5),
-            use_container_width=True
-        )
+        cur_key = file_hash(cur_bytes)
+        sheet_names = cached_sheet_names(cur_key, cur_bytes)
+        multi_sheet = len(sheet_names) > 1 and st.checkbox("Gabungkan beberapa sheet (layout sama)", value=False)
+        if multi_sheet:
+            sheet_sel = st.multiselect("Pilih Sheet • Data Bulan Ini", sheet_names, default=sheet_names)
+        else:
+            sheet_sel = st.selectbox("Pilih Sheet • Data Bulan Ini", sheet_names, index=0)
+        if multi_sheet and not sheet_sel:
+            st.warning("Pilih minimal satu sheet.")
+        else:
+            with perf.stage("unpivot") as rec:
+                if multi_sheet:
+                    df_long = cached_unpivot_sheets(cur_key, tuple(sheet_sel), cur_bytes)
+                else:
+                    df_long = cached_unpivot(cur_key, sheet_sel, cur_bytes)
+                rec["rows"] = len(df_long)
+            st.success(f"Unpivot OK • Baris: {len(df_long):,}")
+            if multi_sheet:
+                per_sheet = df_long["Sheet"].value_counts(sort=False) if "Sheet" in df_long.columns else {}
+                st.caption(" • ".join(f"{name}: {per_sheet.get(name, 0):,}" for name in sheet_sel))
+            st.dataframe(
+                df_long.sort_values(["Daerah","OrderKey"], na_position="last").head(5),
+                use_container_width=True
+            )
     except Exception as e:
         st.error(f"Gagal unpivot Data Bulan Ini: {e}")
 
+export_fmt = st.radio("Format download", list(EXPORT_FORMATS), horizontal=True)
+export_delta = st.checkbox("Export delta (hanya baris baru / berubah vs hasil sebelumnya)", value=False,
+                           help="Snapshot hasil sebelumnya diperbarui setiap 'Simpan ke history store'.")
+uploaded_prev = None
+if export_delta:
+    uploaded_prev = st.file_uploader("Data Hasil sebelumnya (opsional; default: snapshot di history store)",
+                                     type=list(EXPORT_FORMATS))
+build_cube = st.checkbox("Bangun rollup cube (Daerah / Pulau / Area AP / Nasional x Merk / Holding / Produsen)",
+                         value=False, help="Seluruh history ikut dibaca, juga di mode inkremental.")
+use_result_cache = st.checkbox("Pakai cache hasil (input & opsi sama → hasil langsung)", value=True,
+                               help="Dilewati bila 'Simpan ke history store' aktif, karena history harus ditulis.")
+with st.expander("Cache hasil", expanded=False):
+    n_cache, mb_cache = result_cache_stats()
+    st.caption(f"{n_cache} entri • {mb_cache:,.1f} / {RESULT_CACHE_MAX_MB:,.0f} MB • {RESULT_CACHE_DIR}")
+    if st.button("Kosongkan cache hasil"):
+        st.success(f"Cache dikosongkan • {result_cache_clear()} entri dihapus.")
+
 start = st.button(
     "Start Proses",
     type="primary",
-    disabled=not (df_long is not None and uploaded_db is not None and uploaded_map is not None)
+    disabled=not (df_long is not None and db_ready and uploaded_map is not None)
 )
 
-if not (uploaded_current and uploaded_db and uploaded_map):
+if not (uploaded_current and db_ready and uploaded_map):
     st.info("Upload tiga file: Data Bulan Ini, Database, dan Mapping.")
 
 if start:
-    try:
-        db_bytes  = get_bytes(uploaded_db)
-        map_bytes = get_bytes(uploaded_map)
-        db = pd.read_excel(io.BytesIO(db_bytes), engine="openpyxl")
-        mapping_df = pd.read_excel(io.BytesIO(map_bytes), engine="openpyxl")
-
-        current = df_long.copy()
-        current["Tahun"]  = int(tahun_input)
-        current["nbulan"] = int(bulan_input)
-        current["Bulan"]  = current["nbulan"].astype(int).map(bulan_map)
-        current["Negara"] = "Domestik"
-        if "Daerah" in current.columns:
-            current["Pulau"] = current["Daerah"].astype(str).map(daerah_to_pulau).fillna("Lainnya")
-
-        if "Total" in current.columns:
-            current["Total"] = to_numeric_series(current["Total"])
-        if "Total" in db.columns:
-            db["Total"] = to_numeric_series(db["Total"])
-
-        current_core = safe_select(current, BASE_COLS)
-        if {"Merk","Daerah","Segment"}.issubset(mapping_df.columns):
-            seg_map = mapping_df.drop_duplicates(["Merk","Daerah"])[["Merk","Daerah","Segment"]]
-            current_core = current_core.merge(seg_map, on=["Merk","Daerah"], how="left")
-        if {"Daerah","Area AP"}.issubset(mapping_df.columns):
-            area_map = mapping_df.drop_duplicates(["Daerah"])[["Daerah","Area AP"]]
-            current_core = current_core.merge(area_map, on="Daerah", how="left")
-
-        keep_cols = BASE_COLS + [c for c in ["Segment","Area AP"]
-                                 if c in (set(db.columns) | set(current_core.columns))]
-        keep_cols = [c for c in keep_cols if c in (set(db.columns) | set(current_core.columns))]
-        db_aligned = safe_select(db, keep_cols)
-        current_aligned = safe_select(current_core, keep_cols)
-
-        if {"Tahun","nbulan"}.issubset(current_aligned.columns):
-            y_now = int(current_aligned["Tahun"].max())
-            m_now = current_aligned.loc[current_aligned["Tahun"].eq(y_now), "nbulan"].max()
-            db_clean = db_aligned[~((db_aligned["Tahun"] == y_now) & (db_aligned["nbulan"] == m_now))]
-        else:
-            db_clean = db_aligned
-
-        combined = pd.concat([db_clean, current_aligned], ignore_index=True)
-        result = calc_ms_and_growth(combined)
-        result = apply_daerah_order(result)
-
-        final_cols = keep_cols + ["MS","MoM Growth %","YoY Growth %","YtD Growth %",
-                                  "Total Merk YtD","Total All YtD","MSY"]
-        final_cols = [c for c in final_cols if c in result.columns]
-
-        final = (
-            result[final_cols]
-            .sort_values(["Tahun","nbulan","Merk","Daerah"], na_position="last")
-            .reset_index(drop=True)
+    # Hasil lama tidak ditampilkan lagi; proses jalan di job latar belakang
+    for k in ("result", "result_index", "outputs", "job_perf"):
+        st.session_state.pop(k, None)
+    db_bytes, map_bytes = get_bytes(uploaded_db), get_bytes(uploaded_map)
+    prev_bytes = get_bytes(uploaded_prev)
+    prev_fmt = os.path.splitext(uploaded_prev.name)[1].lstrip(".").lower() if uploaded_prev is not None else None
+    cache_key = None
+    if use_result_cache and not save_history:
+        cache_key = result_cache_key(
+            current=cur_key, sheet=sheet_sel,
+            database=store_fingerprint() if use_store else file_hash(db_bytes),
+            mapping=file_hash(map_bytes), tahun=int(tahun_input), nbulan=int(bulan_input),
+            incremental=incremental, remap_history=remap_history, float32=use_float32,
+            export_fmt=export_fmt, build_cube=build_cube, export_delta=export_delta,
+            previous=(file_hash(prev_bytes) if prev_bytes is not None else store_fingerprint())
+            if export_delta else None,
         )
+    cached = result_cache_get(cache_key) if cache_key else None
+    if cached is not None:
+        st.session_state["result"] = cached["final"]
+        st.session_state["result_index"] = build_result_index(cached["final"])
+        st.session_state["outputs"] = dict(cached, messages=["Dari cache hasil (input & opsi sama)"] + cached["messages"])
+    else:
+        opts = dict(
+            df_long=df_long, tahun=int(tahun_input), nbulan=int(bulan_input),
+            use_store=use_store, db_bytes=db_bytes, map_bytes=map_bytes,
+            incremental=incremental, verify=verify_incremental, save_history=save_history,
+            remap_history=remap_history, float32=use_float32, export_fmt=export_fmt, build_cube=build_cube,
+            export_delta=export_delta, prev_bytes=prev_bytes, prev_fmt=prev_fmt,
+            cache_key=cache_key, pre_stages=list(perf.stages),
+            log_params=dict(tahun=int(tahun_input), nbulan=int(bulan_input), sumber=db_source,
+                            mode=calc_mode, float32=use_float32, format=export_fmt, delta=export_delta),
+        )
+        job = job_queue().submit(start_process, opts, label=f"{int(tahun_input)}-{int(bulan_input):02d}",
+                                 n_stages=count_stages(opts), memory=profile_memory)
+        st.session_state["job_id"] = job.id
 
-        if {"Tahun","Bulan","Daerah","Merk","Kemasan"}.issubset(final.columns):
-            final["X"] = (
-                final["Tahun"].astype(str)
-                + final["Bulan"].astype(str)
-                + final["Daerah"].astype(str)
-                + final["Merk"].astype(str)
-                + final["Kemasan"].astype(str)
-            )
+# ======================
+# STATUS JOB & HASIL
+# ======================
+job_id = st.session_state.get("job_id")
+job = job_queue().get(job_id) if job_id is not None else None
+if job is not None and not job.active:
+    # Job selesai → pindahkan hasil ke session, lepaskan dari antrian
+    job_queue().pop(job_id)
+    st.session_state.pop("job_id", None)
+    st.session_state["job_perf"] = (job.perf.to_frame(), job.perf.total_seconds(), job.result and job.result.get("log"))
+    if job.status == JOB_DONE:
+        st.session_state["result"] = job.result["final"]
+        st.session_state["result_index"] = job.result["result_index"]
+        st.session_state["outputs"] = job.result
+    elif job.status == JOB_FAILED:
+        st.error(f"Gagal memproses: {job.error}")
+    else:
+        st.warning(f"Proses {job.label} dibatalkan.")
+    job = None
+
+@st.fragment(run_every=1.0)
+def job_panel(job_id: int):
+    """Progres job (diperbarui tiap detik tanpa rerun seluruh app)."""
+    job = job_queue().get(job_id)
+    if job is None or not job.active:
+        st.rerun(scope="app")
+        return
+    counts = job_queue().counts()
+    if job.status == JOB_QUEUED:
+        text = f"{job.label} • menunggu worker ({counts.get(JOB_QUEUED, 0)} antri)"
+    else:
+        text = f"{job.label} • {job.stage or 'mulai'} • {job.elapsed():.0f} s"
+    st.progress(job.progress, text=text)
+    st.caption(f"Job berjalan: {counts.get(JOB_RUNNING, 0)} / {JOB_WORKERS} worker • antri: {counts.get(JOB_QUEUED, 0)}")
+    if st.button("Batalkan proses", key=f"cancel_{job_id}"):
+        job.cancel()
+        st.caption("Pembatalan diminta — berhenti di batas tahap berikutnya.")
+
+if job is not None:
+    job_panel(job.id)
+
+outputs = st.session_state.get("outputs")
+if outputs is not None:
+    for msg in outputs["messages"]:
+        st.success(msg)
+    for label, data, file_name, mime in outputs["downloads"]:
+        st.download_button(label, data, file_name=file_name, mime=mime, key=f"dl_{file_name}")
+
+if "job_perf" in st.session_state:
+    perf_frame, perf_total, perf_log = st.session_state["job_perf"]
+    with st.expander(f"Performa per tahap • total {perf_total:.2f} s", expanded=False):
+        st.dataframe(perf_frame, use_container_width=True)
+        if perf_log:
+            st.caption(perf_log)
 
-        desired = ["X","Tahun","Bulan","Daerah","Pulau","Produsen","Total",
-                   "Kemasan","Negara","Holding","Merk","nbulan",
-                   "MS","MoM Growth %","YoY Growth %","YtD Growth %",
-                   "Total Merk YtD","Total All YtD","MSY"]
-        final = safe_select(final, desired)
-
-        st.success(f"Selesai! Baris hasil: {len(final):,}")
-        st.dataframe(final.head(5), use_container_width=True)
-
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as w:
-            final.to_excel(w, index=False, sheet_name="Result")
-        buf.seek(0)
-        st.download_button(
-            "Download Data_Hasil.xlsx", buf,
-            file_name="Data_Hasil.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    except Exception as e:
-        st.error(f"Gagal memproses: {e}")
+# ======================
+# EXPLORER HASIL
+# ======================
+# Filter dievaluasi di server (index per kolom); hanya satu halaman yang
+# dikirim ke browser.
+if "result" in st.session_state:
+    final_all = st.session_state["result"]
+    result_index = st.session_state["result_index"]
+    with st.expander("Explorer Hasil", expanded=True):
+        filter_cols = st.columns(3)
+        filters = {}
+        for i, col in enumerate(c for c in EXPLORER_FILTERS if c in result_index):
+            filters[col] = filter_cols[i % 3].multiselect(col, list(result_index[col]), key=f"explorer_{col}")
+        rows = filter_positions(result_index, filters)
+        total = len(final_all) if rows is None else len(rows)
+
+        size_col, page_col = st.columns(2)
+        page_size = size_col.selectbox("Baris per halaman", [50, 100, 500, 1000], index=1, key="explorer_page_size")
+        n_pages = max((total + page_size - 1) // page_size, 1)
+        if st.session_state.get("explorer_page", 1) > n_pages:
+            st.session_state["explorer_page"] = 1   # filter mempersempit hasil
+        page = page_col.number_input("Halaman", min_value=1, max_value=n_pages,
+                                     value=1, step=1, key="explorer_page")
+        page = min(int(page), n_pages)
+        first = (page - 1) * page_size
+        st.caption(f"Halaman {page:,} dari {n_pages:,} • "
+                   f"baris {min(first + 1, total):,}–{min(first + page_size, total):,} dari {total:,}")
+        st.dataframe(result_page(final_all, rows, page - 1, page_size), use_container_width=True)
@@ -0,0 +1,19 @@
+"""Daerah di luar DAERAH_ORDER: NaN (default) atau dipertahankan (jaga.py)."""
+import pandas as pd
+
+import engine
+
+
+def test_unknown_daerah_default_nan():
+    df = engine.apply_daerah_order(pd.DataFrame({"Daerah": ["Jatim", "Jawa Timur"]}))
+    assert df["Daerah"].iloc[0] == "Jatim"
+    assert pd.isna(df["Daerah"].iloc[1])
+
+
+def test_unknown_daerah_kept_after_order():
+    df = pd.DataFrame({"Daerah": ["Jawa Timur", " Jatim", "D.I. Aceh", "", None]})
+    out = engine.apply_daerah_order(df.copy(), keep_unknown=True)
+    assert out["Daerah"].tolist()[:3] == ["Jawa Timur", "Jatim", "D.I. Aceh"]
+    assert list(out["Daerah"].cat.categories[-1:]) == ["Jawa Timur"]
+    assert out.sort_values("Daerah")["Daerah"].tolist()[:3] == ["D.I. Aceh", "Jatim", "Jawa Timur"]
+    assert engine.unknown_daerah(df["Daerah"]) == ["Jawa Timur"]
@@ -0,0 +1,90 @@
+"""Export delta: hasil yang dibaca ulang dari file tidak boleh terdeteksi berubah."""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+
+@pytest.fixture(scope="module")
+def final() -> pd.DataFrame:
+    """Hasil kecil dengan Total bulat, Total 0 (growth 0/0 → NaN) & growth pecahan."""
+    rows = []
+    combos = itertools.product(["Jabar", "Jatim"], ["Merk A", "Merk B"], ["Bag", "Bulk"])
+    for i, (daerah, merk, kemasan) in enumerate(combos):
+        for t, (tahun, nbulan) in enumerate([(2024, b) for b in range(1, 13)] + [(2025, 1), (2025, 2)]):
+            total = 0.0 if (merk == "Merk B" and kemasan == "Bulk" and t < 3) else float(100 + 7 * i + 3 * t)
+            rows.append({"Tahun": tahun, "Bulan": engine.bulan_map[nbulan], "nbulan": nbulan,
+                         "Daerah": daerah, "Pulau": "Jawa", "Produsen": "P1", "Total": total,
+                         "Kemasan": kemasan, "Negara": "Domestik", "Holding": "H1", "Merk": merk})
+    db = pd.DataFrame(rows)
+    keep_cols = [c for c in engine.BASE_COLS if c in db.columns]
+    return engine.finalize_result(engine.calc_ms_and_growth(db), keep_cols)
+
+
+@pytest.mark.parametrize("fmt", list(engine.EXPORT_FORMATS))
+def test_roundtrip_has_no_changes(final, fmt):
+    back = engine.read_result(engine.export_result(final, fmt), fmt)
+    delta, counts = engine.result_delta(back, engine.result_digest(final))
+    assert counts == {"baru": 0, "berubah": 0, "sama": len(final)}
+    assert delta.empty
+
+
+def test_nan_sign_bit_is_ignored(final):
+    assert final["MoM Growth %"].isna().any()
+    neg = final.copy()
+    nan_rows = neg["MoM Growth %"].isna()
+    neg.loc[nan_rows, "MoM Growth %"] = np.copysign(np.nan, -1.0)
+    _, counts = engine.result_delta(neg, engine.result_digest(final))
+    assert counts["berubah"] == 0
+
+
+def test_whole_number_float_equals_int(final):
+    as_int = final.assign(Total=final["Total"].round().astype("int64"))
+    _, counts = engine.result_delta(as_int, engine.result_digest(final))
+    assert counts["berubah"] == 0
+
+
+def test_changed_and_new_rows(final):
+    previous = engine.result_digest(final.iloc[1:])
+    changed = final.copy()
+    changed.loc[5, "Total"] += 1
+    delta, counts = engine.result_delta(changed, previous)
+    assert counts == {"baru": 1, "berubah": 1, "sama": len(final) - 2}
+    assert len(delta) == 2
+
+
+@pytest.fixture
+def duplicate_x() -> pd.DataFrame:
+    """Satu Merk di dua Produsen / Holding untuk Daerah, Kemasan & periode yang sama → X kembar."""
+    rows = [{"Tahun": 2025, "Bulan": "Jan", "nbulan": 1, "Daerah": "Jabar", "Pulau": "Jawa",
+             "Produsen": produsen, "Total": total, "Kemasan": "Bag", "Negara": "Domestik",
+             "Holding": holding, "Merk": "Merk A"}
+            for produsen, holding, total in [("P1", "H1", 10.0), ("P2", "H2", 30.0), ("P1", "H1", 5.0)]]
+    db = pd.DataFrame(rows)
+    keep_cols = [c for c in engine.BASE_COLS if c in db.columns]
+    return engine.finalize_result(engine.calc_ms_and_growth(db), keep_cols)
+
+
+def test_duplicate_x_matches_own_snapshot(duplicate_x, tmp_path):
+    assert duplicate_x["X"].duplicated().any()
+    path = str(tmp_path / "history.sqlite")
+    assert engine.digest_write(engine.result_digest(duplicate_x), path) == len(duplicate_x)
+    for previous in (engine.result_digest(duplicate_x), engine.digest_load(path)):
+        delta, counts = engine.result_delta(duplicate_x.iloc[::-1], previous)
+        assert counts == {"baru": 0, "berubah": 0, "sama": len(duplicate_x)}
+        assert delta.empty
+
+
+def test_duplicate_x_one_row_changed(duplicate_x, tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    engine.digest_write(engine.result_digest(duplicate_x), path)
+    changed = duplicate_x.copy()
+    changed.loc[0, "MSY"] = 0.123
+    delta, counts = engine.result_delta(changed, engine.digest_load(path))
+    assert counts == {"baru": 0, "berubah": 1, "sama": len(duplicate_x) - 1}
+    assert delta.loc[0, "MSY"] == 0.123
+    engine.digest_write(engine.result_digest(changed), path)
+    assert len(engine.digest_load(path)) == len(duplicate_x)
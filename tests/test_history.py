@@ -0,0 +1,55 @@
+"""Database dengan baris tanpa periode (total / footer) tidak boleh merusak hitungan."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def frames():
+    rows = []
+    for t, (tahun, nbulan) in enumerate([(2024, b) for b in range(1, 13)] + [(2025, 1)]):
+        for daerah in ["Jabar", "Jatim"]:
+            for merk in ["A", "B"]:
+                rows.append({"Tahun": tahun, "Bulan": engine.bulan_map[nbulan], "nbulan": nbulan,
+                             "Daerah": daerah, "Pulau": "Jawa", "Produsen": "P", "Total": 10.0 + t,
+                             "Kemasan": "Bag", "Negara": "Domestik", "Holding": "H", "Merk": merk})
+    db = pd.DataFrame(rows)
+    total_row = dict(rows[0], Tahun=np.nan, nbulan=np.nan, Bulan=None, Daerah=None, Merk="TOTAL", Total=999.0)
+    current = db[db["Tahun"].eq(2025)]
+    history = db[~db["Tahun"].eq(2025)]
+    return history, pd.concat([history, pd.DataFrame([total_row])], ignore_index=True), current
+
+
+def _full(db, current):
+    db_clean, current_aligned, keep_cols = engine.align_with_history(db, current)
+    combined = pd.concat([db_clean, current_aligned], ignore_index=True)
+    return engine.finalize_result(engine.calc_ms_and_growth(combined), keep_cols)
+
+
+def test_align_ignores_blank_period_rows(frames):
+    history, with_total, current = frames
+    pd.testing.assert_frame_equal(_full(with_total, current), _full(history, current))
+
+
+def test_incremental_ignores_blank_period_rows(frames):
+    history, with_total, current = frames
+    got = engine.calc_ms_and_growth_incremental(with_total, current, verify=True)
+    expected = engine.calc_ms_and_growth_incremental(history, current)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)   # history mentah: Tahun float
+
+
+@pytest.mark.parametrize("nbulan", [0, 13])
+def test_align_drops_out_of_range_nbulan(frames, nbulan):
+    history, _, current = frames
+    bad = pd.concat([history, history.iloc[[0]].assign(nbulan=nbulan)], ignore_index=True)
+    pd.testing.assert_frame_equal(_full(bad, current), _full(history, current))
+
+
+def test_calendar_growth_rejects_out_of_range_nbulan(frames):
+    history, _, _ = frames
+    bad = history.assign(MS=1.0)
+    bad.loc[bad.index[0], "nbulan"] = 13
+    with pytest.raises(ValueError, match="nbulan harus 1..12"):
+        engine.calendar_growth(bad)
@@ -0,0 +1,21 @@
+"""apply_mapping harus sama dengan left merge ke Mapping (nilai & dtype)."""
+import pandas as pd
+import pytest
+
+import engine
+
+MAPPING = pd.DataFrame({"Merk": ["A", "A", "B"], "Daerah": ["Jabar", "Jatim", "Jabar"],
+                        "Segment": ["s1", "s2", "s3"], "Area AP": [1, 2, 1]})
+
+
+def _merge(df: pd.DataFrame) -> pd.DataFrame:
+    seg = MAPPING.drop_duplicates(["Merk", "Daerah"])[["Merk", "Daerah", "Segment"]]
+    area = MAPPING.drop_duplicates(["Daerah"])[["Daerah", "Area AP"]]
+    return df.merge(seg, on=["Merk", "Daerah"], how="left").merge(area, on="Daerah", how="left")
+
+
+@pytest.mark.parametrize("daerah", [["Jabar", "Jatim", "Jabar"], ["Jabar", "Bali", "Jatim"]])
+def test_apply_mapping_matches_merge(daerah):
+    df = pd.DataFrame({"Merk": ["A", "A", "B"], "Daerah": daerah})
+    got = engine.apply_mapping(df, MAPPING)
+    pd.testing.assert_frame_equal(got[["Merk", "Daerah", "Segment", "Area AP"]], _merge(df))
@@ -0,0 +1,64 @@
+"""Parity to_numeric_series (vektor) vs to_number (per elemen) untuk semua format angka."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import to_number, to_numeric_series
+
+CASES = {
+    "eropa":        ["1.234,56", "12.345.678,9", "1.000,0", "999.999,001"],
+    "internasional": ["1,234.56", "12,345,678.9", "1,000.0"],
+    "koma_desimal": ["1067,367", "0,5", "1,234", "12,"],
+    "biasa":        ["1067.367", "1067", "-12.5", "1e3", " 42 ", ".5"],
+    "strip":        ["-", " - ", "--"],
+    "kosong":       ["", "   "],
+    "nan":          [None, np.nan, pd.NA, "nan", "NaN"],
+    "bool":         [True, False, np.bool_(True)],
+    "teks":         ["abc", "1_000", "12a", "1.234.56", "Rp 1.000"],
+    "angka":        [0, 7, -3, 2.5, np.int64(11), np.float64(0.25)],
+    # 16-17 digit signifikan: parser pd.to_numeric bisa meleset 1 ulp dari float()
+    "17_digit":     ["93310.72172956895", "0.30000000000000004", "123456.78901234567",
+                     "93310,72172956895", "1.234.567,8901234567", "9,007,199,254,740,993.5"],
+}
+
+
+def _expected(values: list) -> np.ndarray:
+    return np.array([to_number(v) for v in values], dtype=float)
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_parity_per_format(name):
+    values = CASES[name]
+    got = to_numeric_series(pd.Series(values, dtype=object))
+    np.testing.assert_array_equal(got.to_numpy(), _expected(values))
+
+
+def test_parity_mixed_column():
+    values = [v for vs in CASES.values() for v in vs] * 3
+    got = to_numeric_series(pd.Series(values, dtype=object))
+    np.testing.assert_array_equal(got.to_numpy(), _expected(values))
+
+
+@pytest.mark.parametrize("s", [
+    pd.Series([1, 2, 3]),
+    pd.Series([1.5, np.nan, -2.0]),
+    pd.Series(["1.234,56", "-", None], dtype="str"),
+])
+def test_parity_typed_columns(s):
+    np.testing.assert_array_equal(to_numeric_series(s).to_numpy(), _expected(list(s)))
+
+
+def test_keeps_index_and_float_dtype():
+    s = pd.Series(["1.234,56", "7", "-"], index=[10, 5, 3], dtype=object)
+    got = to_numeric_series(s)
+    assert list(got.index) == [10, 5, 3]
+    assert got.dtype == float
+    assert got.tolist() == [1234.56, 7.0, 0.0]
+
+
+def test_parity_many_long_decimals():
+    rng = np.random.default_rng(0)
+    values = [repr(float(v)) for v in rng.uniform(0, 1e6, 20_000)]
+    values += [v.replace(".", ",") for v in values[:5_000]]
+    got = to_numeric_series(pd.Series(values, dtype=object))
+    np.testing.assert_array_equal(got.to_numpy(), _expected(values))
@@ -0,0 +1,24 @@
+"""Entri cache hasil yang tidak bisa dibaca = miss (dan dibuang), bukan error."""
+import os
+
+import pandas as pd
+import pytest
+
+import engine
+
+
+@pytest.mark.parametrize("pkl", [
+    b"not a pickle",
+    b"cpandas\nNoSuchThing\n.",           # AttributeError (versi pandas lain)
+    b"cno_such_module\nThing\n.",         # ModuleNotFoundError
+])
+def test_unreadable_entry_is_a_miss(tmp_path, pkl):
+    cache_dir = str(tmp_path)
+    final = pd.DataFrame({"X": ["a"], "Total": [1.0]})
+    assert engine.result_cache_put("k", final, ["ok"], [("Download", b"data", "f.csv", "text/csv")],
+                                   cache_dir=cache_dir)
+    assert engine.result_cache_get("k", cache_dir=cache_dir)["messages"] == ["ok"]
+    with open(os.path.join(cache_dir, "k", "final.pkl"), "wb") as f:
+        f.write(pkl)
+    assert engine.result_cache_get("k", cache_dir=cache_dir) is None
+    assert not os.path.exists(os.path.join(cache_dir, "k"))